@@ -51,4 +51,10 @@
 #                'deleted_by' : {id : uuid, user : str, avatar : url, etc},
 #                'group_' : {id : uuid, group_name : str},
 #             }
-                
+
+# 8. EXPENSES IMPORTED ACTIVITY (expenses_imported), one per import batch:
+# metadata = {
+#                'group_name' : str,
+#                'count' : int,
+#                'amount' : float,
+#             }
@@ -154,13 +154,60 @@ AUTH_USER_MODEL = 'user.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'utils.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10
 
 }
 
+# ACTIVITY FAN-OUT
+# drain the activity outbox in a background thread pool right after each commit;
+# disable to leave it to `python manage.py drain_activity_outbox`
+ACTIVITY_OUTBOX_INLINE_DRAIN = os.getenv('ACTIVITY_OUTBOX_INLINE_DRAIN', 'True') == 'True'
+ACTIVITY_OUTBOX_WORKERS = int(os.getenv('ACTIVITY_OUTBOX_WORKERS', 2))
+# groups with more members than this store their activities once and merge them into feeds on read
+ACTIVITY_FANOUT_ON_READ_THRESHOLD = int(os.getenv('ACTIVITY_FANOUT_ON_READ_THRESHOLD', 100))
+
+# TOKEN AUTHENTICATION
+# in-process LRU of token -> user; the TTL bounds how long a token revoked by another process is still accepted
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+
+# MAIL OUTBOX
+# send queued mails in a background thread right after each commit;
+# disable to leave it to `python manage.py send_mail_outbox --loop`
+MAIL_OUTBOX_INLINE_SEND = os.getenv('MAIL_OUTBOX_INLINE_SEND', 'True') == 'True'
+MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+# seconds before the first retry, doubled after every failed attempt
+MAIL_OUTBOX_RETRY_BACKOFF = int(os.getenv('MAIL_OUTBOX_RETRY_BACKOFF', 30))
+
+# EXPIRING CREDENTIALS
+# seconds a password reset OTP / mail verification link stays valid;
+# expired rows are deleted by `python manage.py sweep_expired_credentials`
+CREDENTIAL_TTLS = {
+    'password_reset_otp': int(os.getenv('PASSWORD_RESET_OTP_TTL', 300)),
+    'mail_verification': int(os.getenv('MAIL_VERIFICATION_TTL', 300)),
+}
+
+# LOGIN
+# at most PASSWORD_HASH_WORKERS password hashes run at once, logins past workers + queue get a 503
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 64))
+
+# CACHE
+# local-memory by default; any Django backend works, e.g. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# with CACHE_LOCATION=/var/tmp/split-between-cache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'split-between'),
+    }
+}
+# serialized group detail and balances, keyed by group version
+GROUP_CACHE_ALIAS = os.getenv('GROUP_CACHE_ALIAS', 'default')
+GROUP_CACHE_TIMEOUT = int(os.getenv('GROUP_CACHE_TIMEOUT', 300))
+
 # cloudinary
 cloudinary.config(
     cloud_name = os.getenv('CLOUD_NAME'),
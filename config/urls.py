@@ -43,6 +43,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('user/', include('user.urls')),    
     path('group/', include('group.urls')),    
+    path('expense/', include('expense.urls')),    
 
 
     # rest framework inbuilt
@@ -0,0 +1,40 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from expense.service import ExpenseService
+from group.models import Group
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = 'Bulk import expenses into a group from a CSV or JSON-lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('group', help='Id of the group to import into.')
+        parser.add_argument('path', help='CSV or JSON-lines file, "-" for stdin.')
+        parser.add_argument('--user', required=True, help='Email of the group member recorded as creator.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format, guessed from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Expenses inserted per batch.')
+
+    def handle(self, *args, **options):
+        try:
+            group = Group.objects.get(id=options['group'])
+            user = User.objects.get(email=options['user'])
+        except (Group.DoesNotExist, User.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        path = options['path']
+        format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+
+        if path == '-':
+            result = self.run_import(user, group, sys.stdin, format, options['batch_size'])
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                result = self.run_import(user, group, stream, format, options['batch_size'])
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(f"{result['imported']} expenses imported, {len(result['errors'])} rows skipped."))
+
+    def run_import(self, user, group, stream, format, batch_size):
+        rows = ExpenseService.read_expense_rows(stream, format)
+        return ExpenseService.import_expenses(user=user, group=group, rows=rows, batch_size=batch_size)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from expense.service import ExpenseService
+from group.models import Group
+
+
+class Command(BaseCommand):
+    help = 'Rebuild GroupBalance rows and member net balances from the expense ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', action='append', dest='groups', help='Group id to rebuild (repeatable). Defaults to all groups.')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Groups loaded per query.')
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['groups']:
+            groups = groups.filter(id__in=options['groups'])
+
+        rebuilt = 0
+        written = 0
+        for group in groups.iterator(chunk_size=options['chunk_size']):
+            written += ExpenseService.rebuild_group_balances(group)
+            rebuilt += 1
+            if rebuilt % options['chunk_size'] == 0:
+                self.stdout.write(f'{rebuilt} groups rebuilt...')
+
+        self.stdout.write(self.style.SUCCESS(f'{rebuilt} groups rebuilt, {written} balances written.'))
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('group', '0007_group_sparse_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Expense',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('expense_type', models.CharField(choices=[('group_expense', 'Group Expense'), ('settleup', 'Settle Up')], max_length=40)),
+                ('description', models.CharField(default='Expense', max_length=250)),
+                ('total_amount', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_creators', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='group.group')),
+                ('paid_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_owners', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseContribution',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('share_amount', models.FloatField(default=0)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='expense.expense')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('expense', 'user')},
+            },
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='contributors',
+            field=models.ManyToManyField(related_name='contributed_expenses', through='expense.ExpenseContribution', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='ExpenseHistory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('metadata', models.JSONField(blank=True, default=dict, null=True)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_history', to='expense.expense')),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expense_history', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
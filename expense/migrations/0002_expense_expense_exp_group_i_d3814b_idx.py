@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0001_initial'),
+        ('group', '0009_activity_group_activ_trigger_cf5f61_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'created_at', 'id'], name='expense_exp_group_i_d3814b_idx'),
+        ),
+    ]
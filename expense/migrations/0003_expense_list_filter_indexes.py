@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0002_expense_expense_exp_group_i_d3814b_idx'),
+        ('group', '0013_friendbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['group', 'created_at', 'id'], name='expense_live_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['group', 'paid_by', 'created_at'], name='expense_live_payer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['group', 'expense_type', 'created_at'], name='expense_live_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensecontribution',
+            index=models.Index(fields=['user', 'expense'], name='expense_exp_user_id_44f37b_idx'),
+        ),
+    ]
@@ -53,6 +53,16 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a group's expenses
+            models.Index(fields=['group', 'created_at', 'id']),
+            # expense list and its filters, which never read soft-deleted rows
+            models.Index(fields=['group', 'created_at', 'id'], condition=models.Q(is_deleted=False), name='expense_live_group_idx'),
+            models.Index(fields=['group', 'paid_by', 'created_at'], condition=models.Q(is_deleted=False), name='expense_live_payer_idx'),
+            models.Index(fields=['group', 'expense_type', 'created_at'], condition=models.Q(is_deleted=False), name='expense_live_type_idx'),
+        ]
     
 class ExpenseContribution(models.Model):
     """
@@ -73,6 +83,10 @@ class ExpenseContribution(models.Model):
 
     class Meta:
         unique_together = ('expense', 'user')
+        indexes = [
+            # expenses a user contributed to
+            models.Index(fields=['user', 'expense']),
+        ]
 
 class ExpenseHistory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -1,8 +1,9 @@
 from rest_framework import serializers
-from user.serializers import UserMiniProfileSerializer
+from user.serializers import UserMiniProfileSerializer, fast_user_mini_profile, user_mini_profile_values
 from utils.utils import UserUtils
 from .models import *
 from rest_framework.serializers import ValidationError
+from django.db.models import Exists, OuterRef
 
 class ExpenseContributionSerializer(serializers.ModelSerializer):
     user = UserMiniProfileSerializer()
@@ -19,8 +20,8 @@ class ExpenseHistorySerializer(serializers.ModelSerializer):
         
 
 class ExpenseSerializer(serializers.ModelSerializer):
-    contibutions = ExpenseContributionSerializer(read_only = True, many = True)
-    history = ExpenseHistorySerializer(read_only = True, many = True)
+    contibutions = ExpenseContributionSerializer(source = 'contributions', read_only = True, many = True)
+    history = ExpenseHistorySerializer(source = 'expense_history', read_only = True, many = True)
     class Meta:
         model = Expense
         fields = '__all__'
@@ -29,13 +30,123 @@ class ExpenseSerializer(serializers.ModelSerializer):
     
     def validate(self, attrs):
         group = attrs['group']
-        paid_by = attrs['group']
+        paid_by = attrs['paid_by']
         
-        if paid_by not in group.members.all():
+        if not group.members.filter(id = paid_by.id).exists():
             raise ValidationError('Only Group members can pay for an expense')
 
+        return attrs
+
     def create(self, validated_data):
         validated_data['created_by'] = self.context['user']
         validated_data['expense_type'] = self.context['expense_type']
         return super().create(validated_data)
         
+
+
+class ExpenseImportSerializer(serializers.Serializer):
+    group = serializers.UUIDField()
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices = ['csv', 'jsonl'], required = False)
+
+
+class ExpenseFilterSerializer(serializers.Serializer):
+    """
+    Query parameters of the expense list. The date range is half-open:
+    created_after <= created_at < created_before, dates mean midnight.
+    """
+    created_after = serializers.DateTimeField(required = False, input_formats = ['iso-8601', '%Y-%m-%d'])
+    created_before = serializers.DateTimeField(required = False, input_formats = ['iso-8601', '%Y-%m-%d'])
+    paid_by = serializers.UUIDField(required = False)
+    contributor = serializers.UUIDField(required = False)
+    type = serializers.ChoiceField(choices = Expense.EXPENSE_CHOICES, required = False)
+    min_amount = serializers.FloatField(required = False)
+    max_amount = serializers.FloatField(required = False)
+
+    def validate(self, attrs):
+        if 'created_after' in attrs and 'created_before' in attrs and attrs['created_after'] >= attrs['created_before']:
+            raise ValidationError('created_after must be before created_before')
+        if 'min_amount' in attrs and 'max_amount' in attrs and attrs['min_amount'] > attrs['max_amount']:
+            raise ValidationError('min_amount must not exceed max_amount')
+        return attrs
+
+    def filter_queryset(self, queryset):
+        filters = self.validated_data
+        if 'created_after' in filters:
+            queryset = queryset.filter(created_at__gte = filters['created_after'])
+        if 'created_before' in filters:
+            queryset = queryset.filter(created_at__lt = filters['created_before'])
+        if 'paid_by' in filters:
+            queryset = queryset.filter(paid_by_id = filters['paid_by'])
+        if 'contributor' in filters:
+            queryset = queryset.filter(Exists(ExpenseContribution.objects.filter(expense = OuterRef('pk'), user_id = filters['contributor'])))
+        if 'type' in filters:
+            queryset = queryset.filter(expense_type = filters['type'])
+        if 'min_amount' in filters:
+            queryset = queryset.filter(total_amount__gte = filters['min_amount'])
+        if 'max_amount' in filters:
+            queryset = queryset.filter(total_amount__lte = filters['max_amount'])
+        return queryset
+
+
+# Fast, dict-producing twin of ExpenseSerializer, built from `.values()` rows.
+# Contributions are ordered by id, history by (updated_at, id) and contributors
+# by user id, the same orderings the expense list prefetches use.
+_datetime = serializers.DateTimeField()
+
+EXPENSE_VALUES = (
+    'id', 'expense_type', 'description', 'total_amount', 'created_at', 'updated_at',
+    'is_deleted', 'paid_by_id', 'group_id', 'created_by_id',
+)
+
+def fast_expenses(rows):
+    """
+    Serialize a page of expense rows with two extra queries (contributions and
+    history of the whole page).
+
+    Args:
+    rows (list): Expense rows with EXPENSE_VALUES.
+
+    Returns:
+    list: ExpenseSerializer-shaped dicts.
+    """
+    ids = [row['id'] for row in rows]
+    contributions = {id: [] for id in ids}
+    history = {id: [] for id in ids}
+
+    for contribution in ExpenseContribution.objects.filter(expense_id__in = ids).order_by('id').values(
+            'id', 'expense_id', 'share_amount', *user_mini_profile_values('user__')):
+        contributions[contribution['expense_id']].append(contribution)
+
+    for entry in ExpenseHistory.objects.filter(expense_id__in = ids).order_by('updated_at', 'id').values(
+            'id', 'expense_id', 'updated_at', 'metadata', *user_mini_profile_values('updated_by__')):
+        history[entry['expense_id']].append(entry)
+
+    data = []
+    for row in rows:
+        expense_contributions = contributions[row['id']]
+        data.append({
+            'id': str(row['id']),
+            'contibutions': [{
+                'id': str(contribution['id']),
+                'user': fast_user_mini_profile(contribution, 'user__'),
+                'share_amount': contribution['share_amount'],
+                } for contribution in expense_contributions],
+            'history': [{
+                'id': str(entry['id']),
+                'updated_by': fast_user_mini_profile(entry, 'updated_by__'),
+                'updated_at': _datetime.to_representation(entry['updated_at']),
+                'metadata': entry['metadata'],
+                } for entry in history[row['id']]],
+            'expense_type': row['expense_type'],
+            'description': row['description'],
+            'total_amount': row['total_amount'],
+            'created_at': _datetime.to_representation(row['created_at']),
+            'updated_at': _datetime.to_representation(row['updated_at']),
+            'is_deleted': row['is_deleted'],
+            'paid_by': row['paid_by_id'],
+            'group': row['group_id'],
+            'created_by': row['created_by_id'],
+            'contributors': sorted(contribution['user__id'] for contribution in expense_contributions),
+        })
+    return data
@@ -1,14 +1,26 @@
+import csv
+import json
+import math
 from collections import defaultdict
 from expense.serializers import ExpenseSerializer
-from group.algorithms import UnionFind
-from group.serializers import GroupBalenceSerializer
-from user.serializers import UserMiniProfileSerializer
-from .models import Activity, ExpenseContribution
-from group.models import GroupBalance
-from django.db.models import Q
+import numpy as np
+from group.algorithms import ledger_matrix
+from .models import Expense, ExpenseContribution, ExpenseHistory
+from group.models import Activity, GroupBalance, Membership
 from django.db import transaction
-from django.db.models import Sum, F, Case, When, Value
-from group.service import ActivityService
+from django.db.models import F, Case, When, Value, FloatField
+from rest_framework.serializers import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from group.service import ActivityService, GroupService, BALANCE_TOLERANCE
+
+
+class BalanceLockError(Exception):
+    """
+    The balance rows of a group could not be locked because concurrent writers
+    kept changing them; the write can be retried.
+    """
+
+
 class ExpenseService:
     @staticmethod
     def add_expense(type, user , data): 
@@ -19,7 +31,7 @@ class ExpenseService:
                    }
                 
         expense_data = {
-            'description' : data['descritpion'],
+            'description' : data.get('description', 'Expense'),
             'paid_by' : data['paid_by'],
             'group' : data['group'],
         }
@@ -28,10 +40,10 @@ class ExpenseService:
         expense.is_valid(raise_exception=True)
         expense = expense.save()
 
-        members = expense.group.members.all()
+        members = {str(member.id): member for member in expense.group.members.all()}
         
-        if user not in  members:
-            raise "Only Existing group members can add an expense to the group."
+        if str(user.id) not in members:
+            raise ValidationError("Only Existing group members can add an expense to the group.")
         
         contributions = []
         paid_to_users = {}
@@ -39,64 +51,530 @@ class ExpenseService:
         # add contributions
         for contribution in data['contributions']:
             
-            contributor = contribution['user']
-            share_amount = contribution['share_amount']
+            contributor = members.get(str(contribution['user']))
+            share_amount = float(contribution['share_amount'])
 
-            if contributor in members:
-                contributions.append(ExpenseContribution(expense = expense, user = contributor, share_amount = contribution['share_amount']))
+            if contributor:
+                contributions.append(ExpenseContribution(expense = expense, user = contributor, share_amount = share_amount))
                 expense.total_amount += share_amount
-                if contributor != expense.paid_by:
+                if contributor.id != expense.paid_by_id:
                     paid_to_users[contributor.id] = {'share_amount' : share_amount}
 
-        contributions = ExpenseContribution.objects.bulk_create(contributions, returning = True)
-        expense.save()
+        contributions = ExpenseContribution.objects.bulk_create(contributions)
+        expense.save(update_fields = ['total_amount'])
 
         # add an activity
         activity_type = None
         metadata = {
-                    'group_name' : expense.group_name, 
+                    'group_name' : expense.group.group_name, 
                     'amount' : expense.total_amount,
-                },
+                }
                     
         if type == 'settleup':
             activity_type = 'settledup'
-            {
-                'with' : contributions.first().user.username
-            }
+            metadata['with'] = contributions[0].user.username if contributions else None
             
         else:
             activity_type = 'expense_added'
-            metadata = {
-                    'expense_description' : expense.description,
-                        }
+            metadata['expense_description'] = expense.description
 
         balances = ExpenseService.update_balances_after_adding_expense(paid_by=expense.paid_by, paid_to_users = paid_to_users, group=expense.group)
-        activty = ActivityService.create_activity(type = activity_type, users = members, triggered_by = user, group = expense.group, metadata = metadata)
+        GroupService.bump_version(expense.group_id)
+        activty = ActivityService.create_activity(type = activity_type, users = members.values(), triggered_by = user, group = expense.group, metadata = metadata)
         return expense
 
     @staticmethod
     def update_balances_after_adding_expense(paid_by, paid_to_users, group):
-        balances = group.balances.filter(
-            Q(friend_owes=paid_by) | Q(friend_owns=paid_by))
-        
-        updated_balances = []
-        
-        for balance in balances:
+        """
+        Apply the shares of an expense to the pairwise balances of the group.
 
-            if balance.friend_owes == paid_by:
-                friend =  paid_to_users.pop(balance.friend_owns.id, None)
-                if friend:
-                    balance.balance -= friend['share_amount']
-                    updated_balances.append(balance)
-        
-            else :
-                friend = paid_to_users.pop(balance.friend_owes.id, None)
-                if friend:
-                    balance.balance += friend['share_amount']
+        Args:
+        paid_by (User): The member who paid.
+        paid_to_users (dict): contributor id -> {'share_amount': float}.
+        group (Group): The group of the expense.
+
+        Returns:
+        list: ids of the GroupBalance rows that were changed.
+        """
+        debts = {(friend, paid_by.id): values['share_amount'] for friend, values in paid_to_users.items()}
+        return ExpenseService.apply_balance_deltas(group=group, debts=debts)
+
+    @staticmethod
+    def apply_balance_deltas(group, debts):
+        """
+        Add amounts owed between members to the pairwise balances of the group.
+
+        Balances are changed with database-side F() updates, never read-modify-write,
+        so concurrent expenses in the same group cannot lose each other's updates.
+        Only the rows touched are locked, always in primary key order (GroupBalance
+        rows first, then Membership rows, then the cross-group FriendBalance rows),
+        which keeps concurrent writers deadlock free without serializing the whole group.
+
+        A missing GroupBalance row is treated as a zero balance: it is created
+        for the first non-zero amount between two members. In sparse groups
+        rows that come back to zero are removed again.
+
+        Args:
+        group (Group): The group the balances belong to.
+        debts (dict): (debtor id, creditor id) -> amount the debtor now owes on top.
+
+        Returns:
+        list: ids of the GroupBalance rows that were changed.
+        """
+        # net both directions of a pair into one amount: pair[0] owes pair[1]
+        pairs = defaultdict(float)
+        net_deltas = defaultdict(float)
+        for (debtor, creditor), amount in debts.items():
+            if not amount or debtor == creditor:
+                continue
+            pair = tuple(sorted([debtor, creditor], key=str))
+            pairs[pair] += amount if pair[0] == debtor else -amount
+            net_deltas[debtor] -= amount
+            net_deltas[creditor] += amount
+
+        if not pairs:
+            return []
+
+        with transaction.atomic():
+            deltas = {}
+            for balance_id, friend_owes_id, friend_owns_id in ExpenseService.lock_pair_balances(group=group, pairs=pairs.keys()):
+                if (friend_owes_id, friend_owns_id) in pairs:
+                    deltas[balance_id] = pairs[(friend_owes_id, friend_owns_id)]
+                else:
+                    deltas[balance_id] = -pairs[(friend_owns_id, friend_owes_id)]
+
+            GroupBalance.objects.filter(id__in=deltas.keys()).update(
+                balance=F('balance') + Case(
+                    *[When(id=balance_id, then=Value(delta)) for balance_id, delta in deltas.items()],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                    )
+                )
+
+            # lock memberships in primary key order too before the F() update
+            list(Membership.objects.select_for_update().filter(group=group, user_id__in=net_deltas.keys()).order_by('id').values_list('id', flat=True))
+            GroupService.update_net_balances(group, net_deltas)
+            GroupService.update_friend_balances(debts)
+
+            if group.sparse_balances:
+                GroupBalance.objects.filter(
+                    id__in=deltas.keys(), balance__gte=-BALANCE_TOLERANCE, balance__lte=BALANCE_TOLERANCE).delete()
+
+            GroupService.refresh_simplified_balances(group)
+
+        return list(deltas.keys())
+
+    @staticmethod
+    def reroute_member_balances(group, user):
+        """
+        Move the offsetting debts of a settled member onto the other members
+        before they leave a simplified group.
+
+        A member with a zero net balance can still owe some members and be owed
+        by others; those debts are matched so each of their debtors now owes
+        their creditors directly. Every remaining member keeps the same net
+        balance and the member's own rows all end at zero. All the group's rows
+        are locked in primary key order first, like `apply_balance_deltas`, and
+        the moves are recorded in the ledger (`record_transfers`) so rebuilds
+        replay them.
+
+        Args:
+        group (Group): The group being left.
+        user (User): The leaving member.
+
+        Returns:
+        list: ids of the GroupBalance rows that were changed.
+        """
+        with transaction.atomic():
+            # every row the moves may touch (the leaver's and the pairs of the
+            # other members) is locked up front, in primary key order
+            rows = [
+                (friend_owes_id, friend_owns_id, balance)
+                for friend_owes_id, friend_owns_id, balance in GroupBalance.objects.select_for_update().filter(
+                    group=group).order_by('id').values_list('friend_owes_id', 'friend_owns_id', 'balance')
+                if user.id in (friend_owes_id, friend_owns_id)
+            ]
+
+            # creditors: members the leaver owes, debtors: members owing the leaver
+            creditors, debtors = [], []
+            for friend_owes_id, friend_owns_id, balance in rows:
+                other, amount = (friend_owns_id, balance) if friend_owes_id == user.id else (friend_owes_id, -balance)
+                if amount > BALANCE_TOLERANCE:
+                    creditors.append([other, amount])
+                elif amount < -BALANCE_TOLERANCE:
+                    debtors.append([other, -amount])
+
+            debts = defaultdict(float)
+            for creditor, amount in creditors:
+                debts[(creditor, user.id)] += amount
+            for debtor, amount in debtors:
+                debts[(user.id, debtor)] += amount
+
+            while creditors and debtors:
+                amount = min(creditors[-1][1], debtors[-1][1])
+                debts[(debtors[-1][0], creditors[-1][0])] += round(amount, 2)
+                creditors[-1][1] -= amount
+                debtors[-1][1] -= amount
+                if creditors[-1][1] <= BALANCE_TOLERANCE:
+                    creditors.pop()
+                if debtors[-1][1] <= BALANCE_TOLERANCE:
+                    debtors.pop()
+
+            ExpenseService.record_transfers(
+                group=group, debts=debts, created_by=user, description=f'Balances moved when {user.username} left')
+            return ExpenseService.apply_balance_deltas(group=group, debts=debts)
+
+    @staticmethod
+    def record_transfers(group, debts, created_by, description):
+        """
+        Record balance changes that do not come from an expense as settle-up rows
+        of the ledger (one per creditor), so `rebuild_group_balances` replays them.
+
+        Args:
+        group (Group): The group of the balances.
+        debts (dict): (debtor id, creditor id) -> amount the debtor now owes on top.
+        created_by (User): The member the change is attributed to.
+        description (str): Description of the rows.
+
+        Returns:
+        list: The Expense rows created.
+        """
+        by_creditor = defaultdict(dict)
+        for (debtor, creditor), amount in sorted(debts.items(), key=lambda item: (str(item[0][1]), str(item[0][0]))):
+            if amount and debtor != creditor:
+                by_creditor[creditor][debtor] = round(amount, 2)
+
+        expenses = []
+        contributions = []
+        for creditor, shares in by_creditor.items():
+            expense = Expense(
+                description=description,
+                expense_type='settleup',
+                paid_by_id=creditor,
+                group=group,
+                created_by=created_by,
+                total_amount=round(sum(shares.values()), 2),
+                )
+            expenses.append(expense)
+            contributions += [ExpenseContribution(expense=expense, user_id=debtor, share_amount=amount) for debtor, amount in shares.items()]
+
+        Expense.objects.bulk_create(expenses)
+        ExpenseContribution.objects.bulk_create(contributions)
+        return expenses
+
+    @staticmethod
+    def lock_pair_balances(group, pairs, attempts=5):
+        """
+        Lock (creating them first if needed) the GroupBalance rows of the given
+        member pairs, in primary key order.
+
+        New rows are inserted in the canonical orientation of the pair with
+        ignore_conflicts so two writers racing to create the same pair end up
+        sharing one row. A row deleted by a concurrent sparse cleanup while we
+        waited for its lock is recreated.
+
+        Args:
+        group (Group): The group the balances belong to.
+        pairs (iterable): (member id, member id) tuples, ordered by str(id).
+
+        Returns:
+        list: (id, friend_owes_id, friend_owns_id) of the locked rows.
+
+        Raises:
+        BalanceLockError: If the rows kept changing under us after `attempts` tries.
+        """
+        pairs = set(pairs)
+        users = {user for pair in pairs for user in pair}
+
+        for attempt in range(attempts):
+            found = {}
+            for balance_id, friend_owes_id, friend_owns_id in group.balances.filter(
+                    friend_owes_id__in=users, friend_owns_id__in=users).values_list('id', 'friend_owes_id', 'friend_owns_id'):
+                pair = tuple(sorted([friend_owes_id, friend_owns_id], key=str))
+                if pair in pairs:
+                    found[pair] = balance_id
+
+            # inserted in (friend_owes, friend_owns) order: writers inserting overlapping
+            # pairs then wait on the unique index in the same order instead of deadlocking
+            missing = [GroupBalance(group=group, friend_owes_id=pair[0], friend_owns_id=pair[1])
+                       for pair in sorted(pairs - found.keys(), key=lambda pair: (str(pair[0]), str(pair[1])))]
+            if missing:
+                GroupBalance.objects.bulk_create(missing, ignore_conflicts=True)
+                continue
+
+            balances = list(GroupBalance.objects.select_for_update().filter(id__in=found.values()).order_by('id').values_list('id', 'friend_owes_id', 'friend_owns_id'))
+            if len(balances) == len(pairs):
+                return balances
+
+        raise BalanceLockError('Could not lock group balances, please retry.')
+
+    @staticmethod
+    def rebuild_group_balances(group):
+        """
+        Recompute the GroupBalance rows and member net balances of a group from
+        its Expense / ExpenseContribution ledger, ignoring deleted expenses.
+
+        The whole ledger is loaded with one query into arrays indexed by member,
+        accumulated into a pairwise matrix with a scatter-add and netted per
+        pair, then written back with a single bulk_update (plus the inserts or
+        sparse deletes the new state needs). The group's balance rows and
+        memberships are locked before the ledger is read.
+
+        Args:
+        group (Group): The group to rebuild.
+
+        Returns:
+        int: Number of GroupBalance rows written.
+        """
+        with transaction.atomic():
+            # lock the balance rows then the memberships in primary key order, like
+            # apply_balance_deltas, so concurrent expenses wait for the rebuild and
+            # apply their deltas on top of it instead of being overwritten by it
+            balances = list(group.balances.select_for_update().order_by('id'))
+            memberships = list(Membership.objects.select_for_update().filter(group=group).order_by('id').only('id', 'user_id', 'net_balance'))
+
+            ledger = list(ExpenseContribution.objects.filter(
+                expense__group=group, expense__is_deleted=False,
+                ).exclude(user=F('expense__paid_by')).values_list('user_id', 'expense__paid_by_id', 'share_amount'))
+
+            member_ids = [membership.user_id for membership in memberships]
+            if ledger:
+                debtors, creditors, amounts = zip(*ledger)
+            else:
+                debtors, creditors, amounts = (), (), ()
+
+            users, index = np.unique(np.array(list(debtors) + list(creditors) + member_ids, dtype=object), return_inverse=True)
+            count = len(ledger)
+            matrix = ledger_matrix(index[:count], index[count:2 * count], np.array(amounts, dtype=np.float64), len(users))
+
+            # pairwise[i, j] > 0: users[i] owes users[j]
+            pairwise = np.round(matrix - matrix.T, 2)
+            net = np.round(matrix.sum(axis=0) - matrix.sum(axis=1), 2)
+            position = {user: idx for idx, user in enumerate(users)}
+
+            updated_balances = []
+            settled_balances = []
+            seen = set()
+            for balance in balances:
+                i, j = position.get(balance.friend_owes_id), position.get(balance.friend_owns_id)
+                amount = float(pairwise[i, j]) if i is not None and j is not None else 0.0
+                seen.add((balance.friend_owes_id, balance.friend_owns_id))
+                seen.add((balance.friend_owns_id, balance.friend_owes_id))
+
+                if group.sparse_balances and abs(amount) <= BALANCE_TOLERANCE:
+                    settled_balances.append(balance.id)
+                elif balance.balance != amount:
+                    balance.balance = amount
                     updated_balances.append(balance)
-        
-        # Perform bulk update
-        if updated_balances:
+
+            created_balances = []
+            for i, j in zip(*np.nonzero(pairwise > BALANCE_TOLERANCE)):
+                if (users[i], users[j]) not in seen:
+                    created_balances.append(GroupBalance(group=group, friend_owes_id=users[i], friend_owns_id=users[j], balance=float(pairwise[i, j])))
+
+            for membership in memberships:
+                membership.net_balance = float(net[position[membership.user_id]])
+
             GroupBalance.objects.bulk_update(updated_balances, ['balance'])
+            GroupBalance.objects.bulk_create(created_balances)
+            GroupBalance.objects.filter(id__in=settled_balances).delete()
+            Membership.objects.bulk_update(memberships, ['net_balance'])
+            GroupService.refresh_simplified_balances(group)
+            GroupService.recompute_friend_balances(users=member_ids)
+            GroupService.bump_version(group)
+
+        return len(updated_balances) + len(created_balances)
+
+    @staticmethod
+    def read_expense_rows(stream, format):
+        """
+        Read the records of an expense import stream lazily, without parsing
+        them: `import_expenses` parses each one with `parse_expense_row` so a
+        malformed record is reported like any other invalid row.
+
+        Formats:
+        - 'jsonl': one JSON object per line:
+            {"description": str, "paid_by": uuid, "expense_type": "group_expense"|"settleup",
+             "contributions": [{"user": uuid, "share_amount": float}, ...]}
+        - 'csv': header `description,paid_by,expense_type,contributions` where
+            contributions is `user_id:share_amount;user_id:share_amount`.
+
+        Yields:
+        str | dict: one line per expense (jsonl) or one CSV row (csv).
+        """
+        if format == 'jsonl':
+            for line in stream:
+                if line.strip():
+                    yield line
+            return
+
+        if format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+
+        raise ValidationError(f'Unsupported import format: {format}')
+
+    @staticmethod
+    def parse_expense_row(record):
+        """
+        Parse one record of `read_expense_rows` into an expense dict in the jsonl shape.
+        Records that already are expense dicts are returned as they are.
+
+        Raises:
+        ValueError: If the record is malformed.
+        """
+        if isinstance(record, str):
+            record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError('Expected a JSON object')
+            return record
+
+        if isinstance(record.get('contributions'), str):
+            contributions = []
+            for contribution in filter(None, record['contributions'].split(';')):
+                user, separator, share_amount = contribution.partition(':')
+                if not separator:
+                    raise ValueError(f'Invalid contribution: {contribution}, expected user_id:share_amount')
+                contributions.append({'user': user.strip(), 'share_amount': share_amount})
+            record = {**record, 'contributions': contributions}
+        return record
+
+    @staticmethod
+    def import_expenses(user, group, rows, batch_size=1000):
+        """
+        Import expenses into a group in batches.
+
+        Every batch is validated against one in-memory member set, inserted with
+        two bulk_create calls (Expense, ExpenseContribution), applied to the
+        balances as one set of net deltas and recorded as a single summary
+        `expenses_imported` activity. Invalid rows, malformed ones included, are
+        skipped and reported.
+
+        Args:
+        user (User): The member importing, recorded as created_by.
+        group (Group): The group the expenses are imported into.
+        rows (iterable): records as produced by `read_expense_rows`, or expense dicts.
+        batch_size (int): Number of expenses per batch.
+
+        Returns:
+        dict: {'imported': int, 'errors': [{'row': int, 'error': str}, ...]}
+        """
+        members = {str(member.id): member for member in group.members.all()}
+        if str(user.id) not in members:
+            raise ValidationError("Only Existing group members can add an expense to the group.")
+
+        expense_types = dict(Expense.EXPENSE_CHOICES)
+        imported = 0
+        errors = []
+        batch = []
+
+        for number, row in enumerate(rows, start=1):
+            try:
+                row = ExpenseService.parse_expense_row(row)
+                paid_by = members.get(str(row['paid_by']))
+                if not paid_by:
+                    raise ValueError('Only Group members can pay for an expense')
+
+                expense_type = row.get('expense_type') or 'group_expense'
+                if expense_type not in expense_types:
+                    raise ValueError(f'Invalid expense type: {expense_type}')
+
+                shares = {}
+                for contribution in row['contributions']:
+                    contributor = members.get(str(contribution['user']))
+                    if not contributor:
+                        raise ValueError('Only Group members can contribute to an expense')
+                    share_amount = float(contribution['share_amount'])
+                    if not math.isfinite(share_amount):
+                        raise ValueError(f'Invalid share amount: {share_amount}')
+                    if share_amount < 0:
+                        raise ValueError('Share amount cannot be negative')
+                    shares[contributor.id] = share_amount
+
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append({'row': number, 'error': str(e)})
+                continue
+
+            batch.append((row.get('description') or 'Expense', expense_type, paid_by, shares))
+            if len(batch) >= batch_size:
+                imported += ExpenseService.import_expense_batch(user=user, group=group, batch=batch, members=members.values())
+                batch = []
+
+        if batch:
+            imported += ExpenseService.import_expense_batch(user=user, group=group, batch=batch, members=members.values())
+
+        return {'imported': imported, 'errors': errors}
+
+    @staticmethod
+    def import_expense_batch(user, group, batch, members):
+        expenses = []
+        contributions = []
+        debts = defaultdict(float)
+        total = 0
+
+        for description, expense_type, paid_by, shares in batch:
+            expense = Expense(
+                description=description,
+                expense_type=expense_type,
+                paid_by=paid_by,
+                group=group,
+                created_by=user,
+                total_amount=sum(shares.values()),
+                )
+            expenses.append(expense)
+            total += expense.total_amount
+
+            for contributor, share_amount in shares.items():
+                contributions.append(ExpenseContribution(expense=expense, user_id=contributor, share_amount=share_amount))
+                if contributor != paid_by.id:
+                    debts[(contributor, paid_by.id)] += share_amount
+
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses)
+            ExpenseContribution.objects.bulk_create(contributions)
+            ExpenseService.apply_balance_deltas(group=group, debts=debts)
+            GroupService.bump_version(group)
+            ActivityService.create_activity(
+                type='expenses_imported',
+                users=members,
+                triggered_by=user,
+                group=group,
+                metadata={
+                    'group_name': group.group_name,
+                    'count': len(expenses),
+                    'amount': total,
+                    },
+                )
+
+        return len(expenses)
+
+    @staticmethod
+    def export_group_ledger(group, chunk_size=2000):
+        """
+        Stream a group's full ledger as newline-delimited JSON.
+
+        Expenses, contributions, expense history and activities are read with
+        server-side cursors (`.iterator(chunk_size=...)`) over `.values()` rows,
+        so memory stays constant whatever the size of the group. Every line is
+        one object with a `type` key: expense, contribution, history or activity.
+
+        Yields:
+        str: one JSON document followed by a newline.
+        """
+        encoder = DjangoJSONEncoder()
+        querysets = [
+            ('expense', Expense.objects.filter(group=group).order_by('created_at', 'id').values(
+                'id', 'expense_type', 'description', 'total_amount', 'paid_by_id', 'created_by_id',
+                'created_at', 'updated_at', 'is_deleted')),
+            ('contribution', ExpenseContribution.objects.filter(expense__group=group).order_by('expense_id', 'id').values(
+                'id', 'expense_id', 'user_id', 'share_amount')),
+            ('history', ExpenseHistory.objects.filter(expense__group=group).order_by('updated_at', 'id').values(
+                'id', 'expense_id', 'updated_by_id', 'updated_at', 'metadata')),
+            ('activity', Activity.objects.filter(group=group).order_by('triggered_at', 'id').values(
+                'id', 'activity_type', 'triggered_by_id', 'triggered_at', 'metadata')),
+        ]
 
-        return updated_balances
\ No newline at end of file
+        for type, queryset in querysets:
+            for row in queryset.iterator(chunk_size=chunk_size):
+                row['type'] = type
+                yield encoder.encode(row) + '\n'
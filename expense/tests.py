@@ -1,3 +1,275 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import threading
+from unittest import mock
+from django.db import close_old_connections
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.test import APIClient
+from expense.models import Expense, ExpenseContribution
+from expense.service import ExpenseService
+from group.models import Activity, Group, GroupBalance, Membership
+from user.models import User
 
-# Create your tests here.
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class ConcurrentExpenseTests(TransactionTestCase):
+    """
+    Stress test of AddExpenseView: expenses posted from parallel clients must
+    not lose each other's balance updates, the stored balances have to match a
+    rebuild from the ledger exactly.
+
+    Runs on the project's PostgreSQL settings; databases without row locks
+    (SQLite) skip it. EXPENSE_STRESS_REQUESTS and EXPENSE_STRESS_THREADS
+    scale it, e.g. down for a quick local run.
+    """
+    REQUESTS = int(os.getenv('EXPENSE_STRESS_REQUESTS', 2000))
+    THREADS = int(os.getenv('EXPENSE_STRESS_THREADS', 8))
+    MEMBERS = 6
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user-{i}', email=f'user-{i}@example.com') for i in range(self.MEMBERS)]
+        self.group = Group.objects.create(group_name='trip', admin=self.users[0], creator=self.users[0])
+        for user in self.users[1:]:
+            Membership.objects.create(user=user, group=self.group, added_by=self.users[0])
+
+    def post_expenses(self, thread, count, responses):
+        client = APIClient()
+        rnd = random.Random(thread)
+        try:
+            for i in range(count):
+                payer = rnd.choice(self.users)
+                client.force_authenticate(payer)
+                contributors = rnd.sample(self.users, rnd.randint(2, self.MEMBERS))
+                response = client.post(reverse('add-expense'), {
+                    'description': f'expense {thread}-{i}',
+                    'paid_by': str(payer.id),
+                    'group': str(self.group.id),
+                    # quarters are exact in binary floating point, so sums are exact too
+                    'contributions': [{'user': str(user.id), 'share_amount': rnd.randint(1, 400) / 4} for user in contributors],
+                }, format='json')
+                responses.append(response.status_code)
+        finally:
+            close_old_connections()
+
+    def balances(self):
+        # pair in canonical order -> amount the first user owes the second
+        pairs = {}
+        for friend_owes_id, friend_owns_id, balance in GroupBalance.objects.filter(group=self.group).values_list('friend_owes_id', 'friend_owns_id', 'balance'):
+            if str(friend_owes_id) < str(friend_owns_id):
+                pairs[(friend_owes_id, friend_owns_id)] = round(balance, 2)
+            else:
+                pairs[(friend_owns_id, friend_owes_id)] = round(-balance, 2)
+        pairs = {pair: amount for pair, amount in pairs.items() if amount}
+        net = dict(Membership.objects.filter(group=self.group).values_list('user_id', 'net_balance'))
+        return pairs, {user: round(amount, 2) for user, amount in net.items()}
+
+    def test_parallel_expenses_match_rebuild(self):
+        responses = []
+        per_thread = self.REQUESTS // self.THREADS
+        threads = [threading.Thread(target=self.post_expenses, args=(thread, per_thread, responses)) for thread in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(responses, [204] * per_thread * self.THREADS)
+        self.assertEqual(Expense.objects.filter(group=self.group).count(), per_thread * self.THREADS)
+        pairs, net = self.balances()
+        self.assertAlmostEqual(sum(net.values()), 0, places=2)
+
+        ExpenseService.rebuild_group_balances(self.group)
+        self.assertEqual(self.balances(), (pairs, net))
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class RebuildAfterLeaveTests(TestCase):
+    """
+    Debts moved off a member who left a simplified group are part of the
+    ledger, so rebuilding the balances keeps them on the remaining members.
+    """
+    def setUp(self):
+        self.leaver, self.debtor, self.creditor = [
+            User.objects.create(username=name, email=f'{name}@example.com') for name in ('leaver', 'debtor', 'creditor')]
+        self.group = Group.objects.create(group_name='trip', admin=self.leaver, creator=self.leaver, is_simplified=True)
+        for user in (self.debtor, self.creditor):
+            Membership.objects.create(user=user, group=self.group, added_by=self.leaver)
+
+        # the leaver paid 10 for the debtor and the creditor paid 10 for the leaver
+        for payer, contributor in ((self.leaver, self.debtor), (self.creditor, self.leaver)):
+            ExpenseService.add_expense('group_expense', payer, {
+                'paid_by': payer.id,
+                'group': self.group.id,
+                'contributions': [{'user': contributor.id, 'share_amount': 10}],
+            })
+
+    def balances(self):
+        # every non-zero pair as (debtor, creditor, amount owed)
+        return sorted(
+            (friend_owes_id, friend_owns_id, balance) if balance > 0 else (friend_owns_id, friend_owes_id, -balance)
+            for friend_owes_id, friend_owns_id, balance in GroupBalance.objects.filter(group=self.group).exclude(balance=0).values_list('friend_owes_id', 'friend_owns_id', 'balance'))
+
+    def test_rebuild_keeps_rerouted_debts(self):
+        Membership.objects.get(group=self.group, user=self.leaver).delete()
+        expected = [(self.debtor.id, self.creditor.id, 10.0)]
+        self.assertEqual(self.balances(), expected)
+        self.assertEqual(Expense.objects.filter(group=self.group, expense_type='settleup').count(), 3)
+
+        ExpenseService.rebuild_group_balances(self.group)
+        self.assertEqual(self.balances(), expected)
+        self.assertEqual(dict(Membership.objects.filter(group=self.group).values_list('user_id', 'net_balance')),
+                         {self.debtor.id: -10.0, self.creditor.id: 10.0})
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class ImportExpensesTests(TestCase):
+    """
+    Bulk import: invalid rows are reported by number, the valid ones are
+    inserted batch by batch and a failed batch leaves nothing behind.
+    """
+    def setUp(self):
+        self.payer, self.friend = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('payer', 'friend')]
+        self.outsider = User.objects.create(username='outsider', email='outsider@example.com')
+        self.group = Group.objects.create(group_name='trip', admin=self.payer, creator=self.payer)
+        Membership.objects.create(user=self.friend, group=self.group, added_by=self.payer)
+
+    def line(self, share_amount, contributor=None, paid_by=None):
+        return json.dumps({
+            'description': 'dinner',
+            'paid_by': str((paid_by or self.payer).id),
+            'contributions': [{'user': str((contributor or self.friend).id), 'share_amount': share_amount}],
+            })
+
+    def run_import(self, lines, format='jsonl', batch_size=1000):
+        rows = ExpenseService.read_expense_rows(io.StringIO('\n'.join(lines) + '\n'), format)
+        return ExpenseService.import_expenses(user=self.payer, group=self.group, rows=rows, batch_size=batch_size)
+
+    def owed(self):
+        return dict(Membership.objects.filter(group=self.group).values_list('user__username', 'net_balance'))
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        result = self.run_import([
+            self.line(10),
+            '{not json',
+            self.line(-5),
+            self.line(float('nan')),
+            self.line(float('inf')),
+            self.line(5, contributor=self.outsider),
+            self.line(5, paid_by=self.outsider),
+            '[1, 2]',
+            self.line(2.5),
+            ])
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(Expense.objects.filter(group=self.group).count(), 2)
+        self.assertEqual(self.owed(), {'payer': 12.5, 'friend': -12.5})
+
+    def test_csv_contributions(self):
+        header = 'description,paid_by,expense_type,contributions'
+        result = self.run_import([
+            header,
+            f'lunch,{self.payer.id},,{self.friend.id}:4;{self.payer.id}:4',
+            f'bad,{self.payer.id},,{self.friend.id}-4',
+            ], format='csv')
+
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual([error['row'] for error in result['errors']], [2])
+        self.assertEqual(Expense.objects.get(group=self.group).total_amount, 8)
+        self.assertEqual(self.owed(), {'payer': 4.0, 'friend': -4.0})
+
+    def test_one_activity_and_balance_update_per_batch(self):
+        with mock.patch.object(ExpenseService, 'apply_balance_deltas', wraps=ExpenseService.apply_balance_deltas) as apply_balance_deltas:
+            result = self.run_import([self.line(amount) for amount in range(1, 6)], batch_size=2)
+
+        self.assertEqual(result, {'imported': 5, 'errors': []})
+        self.assertEqual(apply_balance_deltas.call_count, 3)
+        activities = Activity.objects.filter(group=self.group, activity_type='expenses_imported')
+        self.assertEqual(sorted(activity.metadata['count'] for activity in activities), [1, 2, 2])
+        self.assertEqual(ExpenseContribution.objects.filter(expense__group=self.group).count(), 5)
+        self.assertEqual(self.owed(), {'payer': 15.0, 'friend': -15.0})
+
+    def test_failed_batch_is_rolled_back(self):
+        # the second batch fails while its balances are updated: the first stays, nothing of the second does
+        apply_balance_deltas = ExpenseService.apply_balance_deltas
+        calls = []
+        def fail_second_batch(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return apply_balance_deltas(**kwargs)
+
+        with mock.patch.object(ExpenseService, 'apply_balance_deltas', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.run_import([self.line(amount) for amount in range(1, 5)], batch_size=2)
+
+        self.assertEqual(Expense.objects.filter(group=self.group).count(), 2)
+        self.assertEqual(ExpenseContribution.objects.filter(expense__group=self.group).count(), 2)
+        self.assertEqual(Activity.objects.filter(group=self.group, activity_type='expenses_imported').count(), 1)
+        self.assertEqual(self.owed(), {'payer': 3.0, 'friend': -3.0})
+
+        # re-importing the failed rows completes the import exactly once
+        result = self.run_import([self.line(amount) for amount in range(3, 5)], batch_size=2)
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(self.owed(), {'payer': 10.0, 'friend': -10.0})
+        ExpenseService.rebuild_group_balances(self.group)
+        self.assertEqual(self.owed(), {'payer': 10.0, 'friend': -10.0})
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class GroupVersionETagTests(TestCase):
+    """
+    Conditional GETs of the group detail and expense list: 304 while the group
+    version is unchanged, a new ETag once it changes.
+    """
+    def setUp(self):
+        self.payer, self.friend = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('payer', 'friend')]
+        self.group = Group.objects.create(group_name='trip', admin=self.payer, creator=self.payer)
+        Membership.objects.create(user=self.friend, group=self.group, added_by=self.payer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.payer)
+
+    def add_expense(self):
+        ExpenseService.add_expense('group_expense', self.payer, {
+            'paid_by': self.payer.id,
+            'group': self.group.id,
+            'contributions': [{'user': self.friend.id, 'share_amount': 10}],
+            })
+
+    def assertConditionalGet(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+        self.add_expense()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_group_detail(self):
+        self.assertConditionalGet(reverse('group-details', kwargs={'id': self.group.id}))
+
+    def test_expense_list(self):
+        self.assertConditionalGet(reverse('list-expenses', kwargs={'id': self.group.id}))
+
+    def test_invalid_filters_are_rejected_before_the_etag(self):
+        url = reverse('list-expenses', kwargs={'id': self.group.id})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url + '?min_amount=10&max_amount=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_members_get_no_etag(self):
+        self.client.force_authenticate(User.objects.create(username='outsider', email='outsider@example.com'))
+        response = self.client.get(reverse('list-expenses', kwargs={'id': self.group.id}), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        self.assertNotIn('ETag', response)
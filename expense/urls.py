@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('add/', views.AddExpenseView.as_view(), name = 'add-expense'),
+    path('settle-up/', views.SettleUpView.as_view(), name = 'settle-up'),
+    path('import/', views.ImportExpensesView.as_view(), name = 'import-expenses'),
+    path('list/<str:id>/', views.ExpenseListView.as_view(), name = 'list-expenses'),
+    path('export/<str:id>/', views.ExportGroupLedgerView.as_view(), name = 'export-group-ledger'),
+]
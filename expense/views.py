@@ -1,10 +1,16 @@
 from rest_framework import generics
 from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.response import Response
-from expense.service import ExpenseService
+from expense.service import BalanceLockError, ExpenseService
 from .serializers import *
 from rest_framework import permissions
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.http import StreamingHttpResponse
+from utils.pagination import ExpenseCursorPagination
+from utils.conditional import GroupVersionETagMixin
+import io
 
 # Create your views here.
 
@@ -29,6 +35,8 @@ class AddExpenseView(generics.CreateAPIView):
                 data = self.serializer_class(expense).data
 
             return Response({"data" : data}, status = 204) 
+        except BalanceLockError as e:
+            return Response({'error' : str(e)}, status=409)
         except Exception as e:
             return Response({'error' : str(e)}, status=500)
         
@@ -42,26 +50,101 @@ class SettleUpView(generics.CreateAPIView):
     ) 
     def post(self, request, *args, **kwargs):
         try:
-            data = request.data
-            data = {'contributions' : [data.pop('contribution')]}
+            data = {
+                'description' : 'Settle Up',
+                'paid_by' : request.data['paid_by'],
+                'group' : request.data['group'],
+                'contributions' : [request.data['contribution']],
+                }
             with transaction.atomic():
-                expense = ExpenseService.AddExpense(type = 'settleup', data = request.data, user = request.user)   
+                expense = ExpenseService.add_expense(type = 'settleup', data = data, user = request.user)   
                 data = self.serializer_class(expense).data
 
             return Response({"data" : data}, status = 204) 
+        except BalanceLockError as e:
+            return Response({'error' : str(e)}, status=409)
         except Exception as e:
             return Response({'error' : str(e)}, status=500)
 
-class ExpenseListView(generics.ListAPIView):
+class ImportExpensesView(generics.GenericAPIView):
+    serializer_class = ExpenseImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(tags = ['Expense'], 
+    operation_summary= "IMPORT EXPENSES", 
+    operation_description = 'BULK IMPORT EXPENSES TO THE GROUP FROM A CSV OR JSON-LINES FILE'  
+    ) 
+    def post(self, request, *args, **kwargs):
+        try:
+            serializer = self.get_serializer(data = request.data)
+            serializer.is_valid(raise_exception = True)
+            group = request.user.groups_membership.get(id = serializer.validated_data['group'])
+            upload = serializer.validated_data['file']
+            format = serializer.validated_data.get('format') or ('csv' if upload.name.endswith('.csv') else 'jsonl')
+
+            rows = ExpenseService.read_expense_rows(io.TextIOWrapper(upload.file, encoding = 'utf-8'), format)
+            result = ExpenseService.import_expenses(user = request.user, group = group, rows = rows)
+            return Response(result, status = 200)
+        
+        except Group.DoesNotExist:
+            return Response({'error' : 'group not found'}, status=404)
+
+        except ValidationError as e:
+            return Response({'error' : str(e)}, status=400)
+
+        except BalanceLockError as e:
+            return Response({'error' : str(e)}, status=409)
+
+        except Exception as e:
+            return Response({'error' : str(e)}, status=500)
+
+class ExportGroupLedgerView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Expense'], 
+    operation_summary= "EXPORT GROUP LEDGER", 
+    operation_description = 'STREAMS ALL EXPENSES, CONTRIBUTIONS, EXPENSE HISTORY AND ACTIVITIES OF THE GROUP AS NEWLINE-DELIMITED JSON'  
+    ) 
+    def get(self, request, *args, **kwargs):
+        try:
+            group = request.user.groups_membership.get(id = kwargs['id'])
+        except (Group.DoesNotExist, DjangoValidationError):
+            # an id that is not a UUID cannot name a group either
+            return Response({'error' : 'group not found'}, status=404)
+
+        response = StreamingHttpResponse(ExpenseService.export_group_ledger(group), content_type = 'application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="group-{group.id}.ndjson"'
+        return response
+
+class ExpenseListView(GroupVersionETagMixin, generics.ListAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+
+    filters = None
+
+    def validate_request(self):
+        self.filters = ExpenseFilterSerializer(data = self.request.query_params)
+        self.filters.is_valid(raise_exception = True)
 
     def get_queryset(self):
-       return self.request.user.groups_membership.filter(id = self.kwargs['id']).expenses
+       groups = self.request.user.groups_membership.filter(id = self.kwargs['id'])
+       if self.filters is None:
+           self.validate_request()
+       # soft-deleted expenses stay in the ledger export only
+       expenses = Expense.objects.filter(group__in = groups, is_deleted = False)
+       return self.filters.filter_queryset(expenses).values(*EXPENSE_VALUES)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(fast_expenses(page))
     
     @swagger_auto_schema(tags = ['Activity'], 
     operation_summary= "LIST OF ALL THE EXPENSES", 
-    operation_description = 'PROVIDES A LIST OF ALL THE GROUP EXPENSES.'  
+    operation_description = 'PROVIDES A LIST OF ALL THE GROUP EXPENSES, NEWEST FIRST. FILTER BY DATE RANGE (created_after <= created_at < created_before), PAYER, CONTRIBUTOR, TYPE AND AMOUNT.',
+    query_serializer = ExpenseFilterSerializer,
     ) 
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
\ No newline at end of file
@@ -1,3 +1,9 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+
 class UnionFind:
     def __init__(self, n):
         self.parent = list(range(n))
@@ -21,4 +27,87 @@ class UnionFind:
                 self.parent[root_v] = root_u
                 self.rank[root_u] += 1
             return True
-        return False
\ No newline at end of file
+        return False
+
+
+def net_positions(edges, precision=2):
+    """
+    Reduce pairwise balances to one net position per member.
+
+    Args:
+    edges: iterable of (friend_owes, friend_owns, balance) tuples, a positive
+        balance meaning friend_owes owes friend_owns.
+    precision (int): decimal places the net positions are rounded to.
+
+    Returns:
+    dict: member -> net position (positive: is owed money, negative: owes money).
+    """
+    net = defaultdict(float)
+    for owes, owns, amount in edges:
+        net[owes] -= amount
+        net[owns] += amount
+
+    return {member: round(amount, precision) for member, amount in net.items()}
+
+
+def min_cash_flow(edges, precision=2):
+    """
+    Settle a debt graph with the fewest practical transfers.
+
+    Every member is reduced to a net position, then the biggest debtor pays the
+    biggest creditor until one of them is settled. Both sides are kept in heaps,
+    so the whole plan costs O(n log n) in the number of members and uses at most
+    n - 1 transfers.
+
+    Args:
+    edges: iterable of (friend_owes, friend_owns, balance) tuples.
+    precision (int): decimal places amounts are rounded to.
+
+    Returns:
+    list: (debtor, creditor, amount) tuples with amount > 0.
+    """
+    creditors = []
+    debtors = []
+    for member, amount in net_positions(edges, precision).items():
+        if amount > 0:
+            creditors.append((-amount, member))
+        elif amount < 0:
+            debtors.append((amount, member))
+
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = round(min(-credit, -debt), precision)
+        transfers.append((debtor, creditor, amount))
+
+        credit = round(credit + amount, precision)
+        debt = round(debt + amount, precision)
+        if credit < 0:
+            heapq.heappush(creditors, (credit, creditor))
+        if debt < 0:
+            heapq.heappush(debtors, (debt, debtor))
+
+    return transfers
+
+
+def ledger_matrix(debtors, creditors, amounts, n):
+    """
+    Accumulate a ledger of shares into a pairwise debt matrix.
+
+    Args:
+    debtors (array): member index of the contributor of every share.
+    creditors (array): member index of the payer of every share.
+    amounts (array): share amounts.
+    n (int): number of members.
+
+    Returns:
+    ndarray: n x n matrix where [i, j] is the total member i owes member j
+        before netting.
+    """
+    matrix = np.zeros((n, n), dtype=np.float64)
+    np.add.at(matrix, (debtors, creditors), amounts)
+    return matrix
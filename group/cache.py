@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class GroupCache:
+    """
+    Cache of serialized group payloads, keyed by group id and group version.
+
+    Every write that changes a group payload bumps `Group.version` (see
+    `GroupService.bump_version`), which moves readers to new keys: entries of
+    older versions are never read again and simply expire. The signal receivers
+    and the expense write path therefore invalidate the cache by bumping the
+    version; a deleted group drops its current entries right away.
+
+    Payloads computed inside a transaction are not stored, since a rollback
+    would leave them cached under a version that gets reused.
+
+    Works with any Django cache backend (local-memory and file backends included);
+    hit / miss counters are kept in the same cache.
+    """
+    KINDS = ('detail', 'balances')
+    HITS_KEY = 'group-cache:hits'
+    MISSES_KEY = 'group-cache:misses'
+    _missing = object()
+
+    @staticmethod
+    def get_cache():
+        return caches[settings.GROUP_CACHE_ALIAS]
+
+    @staticmethod
+    def key(group_id, version, kind):
+        return f'group:{group_id}:{version}:{kind}'
+
+    @staticmethod
+    def get_or_set(group_id, version, kind, compute):
+        """
+        Return the cached payload of a group version, computing and storing it on a miss.
+
+        Args:
+        group_id (UUID): The group id.
+        version (int): The group version the payload is computed at (or after).
+        kind (str): One of KINDS.
+        compute (callable): Builds the payload on a miss.
+
+        Returns:
+        The cached or freshly computed payload.
+        """
+        cache = GroupCache.get_cache()
+        key = GroupCache.key(group_id, version, kind)
+        value = cache.get(key, GroupCache._missing)
+        if value is not GroupCache._missing:
+            GroupCache.count(GroupCache.HITS_KEY)
+            return value
+
+        GroupCache.count(GroupCache.MISSES_KEY)
+        value = compute()
+        if not transaction.get_connection().in_atomic_block:
+            cache.set(key, value, settings.GROUP_CACHE_TIMEOUT)
+        return value
+
+    @staticmethod
+    def invalidate(group):
+        """
+        Drop the cached payloads of the current version of a group.
+
+        Args:
+        group (Group): The group.
+        """
+        GroupCache.get_cache().delete_many([GroupCache.key(group.id, group.version, kind) for kind in GroupCache.KINDS])
+
+    @staticmethod
+    def count(key):
+        cache = GroupCache.get_cache()
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted between add and incr
+            cache.set(key, 1, None)
+
+    @staticmethod
+    def stats():
+        """
+        Returns:
+        dict: hits, misses and hit_rate since the counters were last reset.
+        """
+        counters = GroupCache.get_cache().get_many([GroupCache.HITS_KEY, GroupCache.MISSES_KEY])
+        hits = counters.get(GroupCache.HITS_KEY, 0)
+        misses = counters.get(GroupCache.MISSES_KEY, 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+
+    @staticmethod
+    def reset_stats():
+        GroupCache.get_cache().delete_many([GroupCache.HITS_KEY, GroupCache.MISSES_KEY])
@@ -0,0 +1,117 @@
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from expense.models import Expense
+from group.models import Activity, Group, GroupBalance, Membership, PendingMembers
+from user.models import User
+
+# indexes of the balance / activity / invitation / expense hot paths, dropped for the "before" run
+BENCHMARK_INDEXES = [
+    (GroupBalance, 'group_group_group_i_0684d7_idx'),
+    (GroupBalance, 'balance_nonzero_group_idx'),
+    (GroupBalance, 'balance_nonzero_owes_idx'),
+    (GroupBalance, 'balance_nonzero_owns_idx'),
+    (Activity, 'group_activ_group_i_a1ca7e_idx'),
+    (PendingMembers, 'group_pendi_group_i_6ff892_idx'),
+    (Expense, 'expense_live_group_idx'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed throwaway data and report EXPLAIN plans and timings of the hot lookups with and '
+        'without their composite / partial indexes. Everything runs in a transaction that is '
+        'rolled back, only use it against a local database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=200, help='Groups to seed.')
+        parser.add_argument('--members', type=int, default=8, help='Members per group.')
+        parser.add_argument('--expenses', type=int, default=200, help='Expenses (and activities) per group.')
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query.')
+        parser.add_argument('--force', action='store_true', help='Run even when DEBUG is off.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to seed benchmark data with DEBUG off, pass --force on a local database.')
+
+        with transaction.atomic():
+            group, user = self.seed(options['groups'], options['members'], options['expenses'])
+            queries = [
+                ('group balances', lambda: GroupBalance.objects.filter(group=group).exclude(balance=0)),
+                ('pair by friend_owns', lambda: GroupBalance.objects.filter(group=group, friend_owns=user)),
+                ('user balances', lambda: GroupBalance.objects.filter(Q(friend_owes=user) | Q(friend_owns=user)).exclude(balance=0)),
+                ('group activities', lambda: Activity.objects.filter(group=group).order_by('-triggered_at', '-id')[:20]),
+                ('sent invitations', lambda: PendingMembers.objects.filter(group=group, invited_by=user)),
+                ('live expenses', lambda: Expense.objects.filter(group=group, is_deleted=False).order_by('-created_at', '-id')[:20]),
+            ]
+
+            after = self.measure(queries, options['repeat'])
+            # plain DROP INDEX statements: the SQLite schema editor cannot be entered inside a transaction
+            schema_editor = connection.SchemaEditorClass(connection)
+            with connection.cursor() as cursor:
+                for model, name in BENCHMARK_INDEXES:
+                    index = next(index for index in model._meta.indexes if index.name == name)
+                    cursor.execute(str(index.remove_sql(model, schema_editor)))
+            self.analyze()
+            before = self.measure(queries, options['repeat'])
+
+            for name, _ in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(f'  before: {before[name][0] * 1000:.3f}ms  {before[name][1]}')
+                self.stdout.write(f'  after:  {after[name][0] * 1000:.3f}ms  {after[name][1]}')
+
+            transaction.set_rollback(True)
+
+    def seed(self, groups, members, expenses):
+        rnd = random.Random(0)
+        users = User.objects.bulk_create([
+            User(username=f'bench-{i}', email=f'bench-{i}@example.com') for i in range(groups + members)])
+
+        # bulk_create skips the signals, memberships and balances are seeded directly
+        seeded = Group.objects.bulk_create([
+            Group(group_name=f'bench-{i}', admin=users[i], creator=users[i]) for i in range(groups)])
+        memberships, balances, invitations, activities, rows = [], [], [], [], []
+        for i, group in enumerate(seeded):
+            group_members = users[i:i + members]
+            for member in group_members:
+                memberships.append(Membership(group=group, user=member, added_by=users[i]))
+            for a, friend_owes in enumerate(group_members):
+                for friend_owns in group_members[a + 1:]:
+                    # most pairs of a non-sparse group are settled
+                    balance = rnd.choice([0, 0, 0, rnd.randint(-50, 50)])
+                    balances.append(GroupBalance(group=group, friend_owes=friend_owes, friend_owns=friend_owns, balance=balance))
+            invitations.append(PendingMembers(group=group, user=users[(i + members) % len(users)], invited_by=users[i]))
+            for _ in range(expenses):
+                paid_by = rnd.choice(group_members)
+                rows.append(Expense(group=group, paid_by=paid_by, created_by=paid_by, expense_type='group_expense',
+                                    total_amount=rnd.randint(1, 100), is_deleted=rnd.random() < 0.1))
+                activities.append(Activity(group=group, activity_type='expense_added', triggered_by=paid_by))
+
+        Membership.objects.bulk_create(memberships, batch_size=1000)
+        GroupBalance.objects.bulk_create(balances, batch_size=1000)
+        PendingMembers.objects.bulk_create(invitations, batch_size=1000)
+        Expense.objects.bulk_create(rows, batch_size=1000)
+        Activity.objects.bulk_create(activities, batch_size=1000)
+        self.analyze()
+
+        self.stdout.write(f'seeded {len(seeded)} groups, {len(balances)} balances, {len(rows)} expenses, {len(activities)} activities')
+        group = seeded[len(seeded) // 2]
+        return group, users[len(seeded) // 2]
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, queryset in queries:
+            plan = ' | '.join(line.strip() for line in queryset().explain().splitlines())
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset())
+            results[name] = ((time.perf_counter() - start) / repeat, plan)
+        return results
@@ -0,0 +1,73 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from expense.models import Expense, ExpenseContribution, ExpenseHistory
+from expense.serializers import EXPENSE_VALUES, ExpenseSerializer, fast_expenses
+from group.models import Activity, Group
+from group.serializers import (
+    ACTIVITY_VALUES, GROUP_BALANCE_VALUES, ActivitySerializer, GroupBalenceSerializer,
+    fast_activity, fast_group_balance,
+)
+from user.models import User
+from user.serializers import USER_MINI_PROFILE_FIELDS, UserMiniProfileSerializer, fast_user_mini_profile
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF serializers of the hot read paths with their fast dict-based twins on a group.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('group', help='Id of the group to serialize.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per serializer.')
+
+    def handle(self, *args, **options):
+        try:
+            group = Group.objects.get(id=options['group'])
+        except Group.DoesNotExist:
+            raise CommandError('group not found')
+
+        balances = list(group.balances.select_related('friend_owes', 'friend_owns'))
+        balance_rows = list(group.balances.values(*GROUP_BALANCE_VALUES))
+        members = list(group.members.all())
+        member_rows = list(group.members.values(*USER_MINI_PROFILE_FIELDS))
+        profiles = {row['id']: fast_user_mini_profile(row) for row in member_rows}
+        activities = list(Activity.objects.filter(group=group).select_related('group', 'triggered_by').order_by('-triggered_at', '-id'))
+        activity_rows = list(Activity.objects.filter(group=group).order_by('-triggered_at', '-id').values(*ACTIVITY_VALUES))
+        expenses = list(Expense.objects.filter(group=group).order_by('-created_at', '-id').prefetch_related(
+            Prefetch('contributions', queryset=ExpenseContribution.objects.select_related('user').order_by('id')),
+            Prefetch('expense_history', queryset=ExpenseHistory.objects.select_related('updated_by').order_by('updated_at', 'id')),
+            Prefetch('contributors', queryset=User.objects.order_by('id')),
+            ))
+        expense_rows = list(Expense.objects.filter(group=group).order_by('-created_at', '-id').values(*EXPENSE_VALUES))
+
+        cases = [
+            ('users', len(members),
+                lambda: UserMiniProfileSerializer(members, many=True).data,
+                lambda: [fast_user_mini_profile(row) for row in member_rows]),
+            ('balances', len(balances),
+                lambda: [GroupBalenceSerializer(balance).data for balance in balances],
+                lambda: [fast_group_balance(row, profiles) for row in balance_rows]),
+            ('activities', len(activities),
+                lambda: ActivitySerializer(activities, many=True).data,
+                lambda: [fast_activity(row) for row in activity_rows]),
+            # the fast expense path includes its two page queries
+            ('expenses', len(expenses),
+                lambda: ExpenseSerializer(expenses, many=True).data,
+                lambda: fast_expenses(expense_rows)),
+        ]
+
+        renderer = JSONRenderer()
+        for name, count, slow, fast in cases:
+            identical = renderer.render(slow()) == renderer.render(fast())
+            slow_time = self.measure(slow, options['repeat'])
+            fast_time = self.measure(fast, options['repeat'])
+            speedup = slow_time / fast_time if fast_time else float('inf')
+            self.stdout.write(
+                f'{name:<12} rows={count:<7} drf={slow_time * 1000:9.2f}ms fast={fast_time * 1000:9.2f}ms '
+                f'speedup={speedup:6.1f}x identical={identical}')
+
+    def measure(self, serialize, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            serialize()
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from group.service import ActivityService
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued activities (ActivityOutbox) to their users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of concurrent drain threads.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Outbox rows handled per transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is empty.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                futures = [executor.submit(self.drain, options['batch_size']) for _ in range(options['workers'])]
+                delivered = sum(future.result() for future in futures)
+                if delivered:
+                    self.stdout.write(f'{delivered} activities delivered.')
+
+                if not options['loop']:
+                    break
+                if not delivered:
+                    time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        try:
+            return ActivityService.drain_outbox(batch_size=batch_size)
+        finally:
+            close_old_connections()
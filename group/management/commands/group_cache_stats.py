@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from group.cache import GroupCache
+
+
+class Command(BaseCommand):
+    help = 'Show the hit / miss counters of the group cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = GroupCache.stats()
+        self.stdout.write(f"hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']}")
+        if options['reset']:
+            GroupCache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
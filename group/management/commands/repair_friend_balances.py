@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from group.service import GroupService
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cross-group FriendBalance totals from GroupBalance rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', help='User id to repair (repeatable). Defaults to all users.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per query.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = GroupService.recompute_friend_balances(users=options['users'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{changed} friend balances repaired.'))
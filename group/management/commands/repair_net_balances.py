@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from group.models import Group
+from group.service import GroupService
+
+
+class Command(BaseCommand):
+    help = 'Recompute Membership.net_balance from GroupBalance rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', action='append', dest='groups', help='Group id to repair (repeatable). Defaults to all groups.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Memberships written per UPDATE.')
+
+    def handle(self, *args, **options):
+        groups = None
+        if options['groups']:
+            groups = Group.objects.filter(id__in=options['groups'])
+
+        with transaction.atomic():
+            changed = GroupService.recompute_net_balances(groups=groups, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{changed} membership net balances repaired.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0003_alter_activity_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='simplify_strategy',
+            field=models.CharField(choices=[('min_cash_flow', 'Min Cash Flow'), ('spanning_tree', 'Spanning Tree')], default='min_cash_flow', max_length=20),
+        ),
+    ]
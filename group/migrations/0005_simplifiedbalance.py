@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0004_group_simplify_strategy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimplifiedBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.FloatField(default=0)),
+                ('friend_owes', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='simplified_owes', to=settings.AUTH_USER_MODEL)),
+                ('friend_owns', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='simplified_owns', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='simplified_balances', to='group.group')),
+            ],
+            options={
+                'unique_together': {('group', 'friend_owes', 'friend_owns')},
+            },
+        ),
+    ]
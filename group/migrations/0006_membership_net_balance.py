@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0005_simplifiedbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membership',
+            name='net_balance',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['group', 'net_balance'], name='group_membe_group_i_eefc27_idx'),
+        ),
+    ]
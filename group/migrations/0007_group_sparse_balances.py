@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0006_membership_net_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='sparse_balances',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0007_group_sparse_balances'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activity',
+            name='activity_type',
+            field=models.CharField(choices=[('group_created', 'Group Created'), ('group_simplified', 'Group Simplified'), ('changed_group_name', 'Changed Group Name'), ('changed_group_description', 'Changed Group Description'), ('changed_group_icon', 'CHanged Group Icon'), ('group_deleted', 'Group Deleted'), ('member_invited', 'Member Invited to Join Group'), ('invitation_dropped', 'Reject/Cancel Invitation to Join Group'), ('member_joined', 'Member Joined Group'), ('member_left', 'Member Left Group'), ('member_removed', 'Member Left Group'), ('expense_added', 'Expense Added to Group'), ('settledup', 'Settled Up with User'), ('expense_edited', 'Expense Edited in Group'), ('expense_deleted', 'Expense Deleted from Group'), ('expenses_imported', 'Expenses Imported to Group')], max_length=40),
+        ),
+    ]
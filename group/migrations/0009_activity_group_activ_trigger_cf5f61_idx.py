@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0008_alter_activity_activity_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['triggered_at', 'id'], name='group_activ_trigger_cf5f61_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0009_activity_group_activ_trigger_cf5f61_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_ids', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='group.activity')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0011_activity_fanout_on_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+    ]
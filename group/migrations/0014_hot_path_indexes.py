@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0013_friendbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['group', 'triggered_at', 'id'], name='group_activ_group_i_a1ca7e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupbalance',
+            index=models.Index(fields=['group', 'friend_owns'], name='group_group_group_i_0684d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupbalance',
+            index=models.Index(condition=models.Q(('balance', 0), _negated=True), fields=['group', 'friend_owes', 'friend_owns'], name='balance_nonzero_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupbalance',
+            index=models.Index(condition=models.Q(('balance', 0), _negated=True), fields=['friend_owes', 'group'], name='balance_nonzero_owes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupbalance',
+            index=models.Index(condition=models.Q(('balance', 0), _negated=True), fields=['friend_owns', 'group'], name='balance_nonzero_owns_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingmembers',
+            index=models.Index(fields=['group', 'invited_by'], name='group_pendi_group_i_6ff892_idx'),
+        ),
+    ]
@@ -52,6 +52,27 @@ class Group(models.Model):
                 - A's net balance with B: $300 (owed to B)
                 - A's net balance with C: $100 (owed to C)
 
+        simplify_strategy (str): The algorithm used to simplify balances when
+            `is_simplified` is enabled.
+            - 'min_cash_flow': nets every member to a single position and matches
+              the largest debtors with the largest creditors (default).
+            - 'spanning_tree': keeps a minimum spanning tree of the original
+              balances (legacy behaviour).
+
+        sparse_balances (bool): When enabled, a GroupBalance row between two members
+            only exists once they have a non-zero balance and is removed again when it
+            is settled; a missing row is read as zero. When disabled, a zero row is
+            created for every pair of members on join.
+
+        fanout_on_read (bool): Set once the group grows past ACTIVITY_FANOUT_ON_READ_THRESHOLD
+            members. Its activities are then stored once, keyed by group, and merged into
+            the members' feeds at read time instead of being fanned out to every member.
+
+        version (int): Monotonic counter bumped (see GroupService.bump_version) by every
+            write that changes what the group endpoints return: expenses, settle-ups,
+            memberships, invitations and edits. It is served as the ETag of the group
+            detail and expense list so polling clients get a 304 when nothing changed.
+
     Signals:
         pre_delete: Signal receiver `check_settle_up_before_group_deletion` checks if there are outstanding balances
             before deleting the group instance.
@@ -60,9 +81,12 @@ class Group(models.Model):
             before removing a member from the group.
         
         pre_save: Signal receiver `create_friendships_before_membership` creates friendships between the new member
-            and existing group members before saving a new membership instance.
+            and existing group members before saving a new membership instance (non-sparse groups only).
     """
-
+    SIMPLIFY_STRATEGY_CHOICES = (
+        ('min_cash_flow', 'Min Cash Flow'),
+        ('spanning_tree', 'Spanning Tree'),
+    )
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     group_name = models.CharField(max_length = 50, null = False, blank=False)
@@ -72,6 +96,10 @@ class Group(models.Model):
     pending_members = models.ManyToManyField(User, related_name='groups_pending', through = 'PendingMembers', through_fields=('group', 'user'),  blank=True)
     total_spending = models.FloatField(default=0)
     is_simplified = models.BooleanField(default=False)
+    simplify_strategy = models.CharField(max_length=20, choices=SIMPLIFY_STRATEGY_CHOICES, default='min_cash_flow')
+    sparse_balances = models.BooleanField(default=True)
+    fanout_on_read = models.BooleanField(default=False)
+    version = models.PositiveBigIntegerField(default=1, editable=False)
     is_deleted = models.BooleanField(default=False)
     admin = models.ForeignKey(User, null = False, blank=False, editable=False, on_delete= models.CASCADE, related_name='group_admin')
     creator = models.ForeignKey(User, null = False, blank=False, editable=False, on_delete= models.CASCADE, related_name='group_creator')
@@ -108,6 +136,11 @@ class Membership(models.Model):
         date_joined (DateTimeField): The date and time when the user joined the group.
           - null=True, blank=True: Allows the date_joined field to be nullable and blank initially.
 
+        net_balance (FloatField): Denormalized net position of the member in the group,
+          kept in step with every GroupBalance update.
+          - positive: the member is owed money, negative: the member owes money.
+          - `python manage.py repair_net_balances` recomputes it from GroupBalance.
+
     Methods:
         __str__: Returns a string representation of the membership instance indicating details like user, added_by, and invitation_accepted.
 
@@ -122,11 +155,15 @@ class Membership(models.Model):
     group = models.ForeignKey(Group, editable=False, on_delete=models.CASCADE)
     added_by = models.ForeignKey(User, editable=False, on_delete=models.CASCADE, related_name='added_membership')
     date_joined = models.DateTimeField(auto_now_add=True)
+    net_balance = models.FloatField(default=0)
 
     def __str__(self):
         return f"{self.user} is a member of {self.gorup}"
     class Meta:
       unique_together = ('group', 'user')
+      indexes = [
+          models.Index(fields=['group', 'net_balance']),
+      ]
 
 class PendingMembers(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -142,6 +179,10 @@ class PendingMembers(models.Model):
 
     class Meta:
       unique_together = ('group', 'user')
+      indexes = [
+          # invitations sent by a member of the group
+          models.Index(fields=['group', 'invited_by']),
+      ]
 
 class GroupBalance(models.Model):
     """
@@ -178,6 +219,76 @@ class GroupBalance(models.Model):
 
     class Meta:
         unique_together = ('group', 'friend_owes', 'friend_owns')
+        indexes = [
+            # (group, friend_owes) is served by the unique_together index
+            models.Index(fields=['group', 'friend_owns']),
+            # only non-zero balances are ever listed (non-sparse groups keep zero rows)
+            models.Index(fields=['group', 'friend_owes', 'friend_owns'], condition=~models.Q(balance=0), name='balance_nonzero_group_idx'),
+            models.Index(fields=['friend_owes', 'group'], condition=~models.Q(balance=0), name='balance_nonzero_owes_idx'),
+            models.Index(fields=['friend_owns', 'group'], condition=~models.Q(balance=0), name='balance_nonzero_owns_idx'),
+        ]
+
+
+class SimplifiedBalance(models.Model):
+    """
+    Materialized settle-up plan of a simplified group.
+
+    Rows are rebuilt by `GroupService.refresh_simplified_balances` whenever the
+    group's `GroupBalance` rows (or its simplification settings) change, so reads
+    of a simplified group never recompute the plan.
+
+    Fields:
+    - group (ForeignKey): The group the plan belongs to.
+      - related_name='simplified_balances': Allows reverse querying from the Group model.
+    - friend_owes (ForeignKey): The member who has to pay.
+    - friend_owns (ForeignKey): The member who gets paid.
+    - balance (FloatField): The amount friend_owes pays to friend_owns, always positive.
+
+    Meta:
+    - unique_together: One transfer per pair of members in a group.
+    """
+    group = models.ForeignKey(Group, related_name='simplified_balances', null=False, blank=False, editable=False, on_delete=models.CASCADE)
+    friend_owes = models.ForeignKey(User, editable=False, on_delete=models.CASCADE, related_name='simplified_owes')
+    friend_owns = models.ForeignKey(User, editable=False, on_delete=models.CASCADE, related_name='simplified_owns')
+    balance = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Group: {self.group.group_name}, Simplified: {self.friend_owes, self.friend_owns}, Balance: {self.balance}"
+
+    class Meta:
+        unique_together = ('group', 'friend_owes', 'friend_owns')
+
+
+class FriendBalance(models.Model):
+    """
+    Running total of what a friend owes a user across all their shared groups.
+
+    Each pair of users has two mirrored rows, (user, friend) and (friend, user),
+    kept up to date by `GroupService.update_friend_balances` on the expense write
+    path so "how much do I owe Alice overall" is a single indexed lookup. The
+    totals are the raw pairwise balances, whatever the simplification of the
+    groups. `GroupService.recompute_friend_balances` rebuilds them from GroupBalance.
+
+    Fields:
+    - user (ForeignKey): The user the balance is seen from.
+      - related_name='friend_balances': Allows reverse querying from the User model.
+    - friend (ForeignKey): The other user.
+    - balance (FloatField): Amount the friend owes the user; negative when the user owes the friend.
+    - updated_at (DateTimeField): Last change.
+
+    Meta:
+    - unique_together: One row per ordered pair of users.
+    """
+    user = models.ForeignKey(User, editable=False, on_delete=models.CASCADE, related_name='friend_balances')
+    friend = models.ForeignKey(User, editable=False, on_delete=models.CASCADE, related_name='+')
+    balance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.friend} owes {self.user}: {self.balance}"
+
+    class Meta:
+        unique_together = ('user', 'friend')
 
 
 class Activity(models.Model):
@@ -197,6 +308,7 @@ class Activity(models.Model):
         ('settledup', 'Settled Up with User'),
         ('expense_edited', 'Expense Edited in Group'),
         ('expense_deleted', 'Expense Deleted from Group'),
+        ('expenses_imported', 'Expenses Imported to Group'),
         # Add more choices as needed
     )
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -206,6 +318,39 @@ class Activity(models.Model):
     group = models.ForeignKey(Group, null = True, default = None, on_delete=models.SET_NULL, related_name='activites')
     users = models.ManyToManyField(User, symmetrical=False, related_name='activites')
     metadata = models.JSONField(null = True, blank=True, default=dict)
+    fanout_on_read = models.BooleanField(default=False)
     
     def __str__(self):
         return f"{self.users} - {self.activity_type} - {self.created_at}"
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the activity feed
+            models.Index(fields=['triggered_at', 'id']),
+            # activities of a group (ledger export, group history)
+            models.Index(fields=['group', 'triggered_at', 'id']),
+            # per-group stream of fan-out-on-read activities
+            models.Index(fields=['group', 'triggered_at', 'id'], condition=models.Q(fanout_on_read=True), name='activity_group_stream_idx'),
+        ]
+
+
+class ActivityOutbox(models.Model):
+    """
+    Pending fan-out of an activity to its users.
+
+    `ActivityService.create_activity` stores the activity and one outbox row with
+    the ids of the users to notify inside the request transaction. The
+    `drain_activity_outbox` worker (or the in-process drain scheduled on commit)
+    later writes the Activity.users through rows in bulk and deletes the outbox row.
+
+    Fields:
+    - activity (ForeignKey): The activity to fan out.
+    - user_ids (JSONField): Ids of the users the activity is delivered to.
+    - created_at (DateTimeField): When the activity was recorded.
+    """
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='outbox')
+    user_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fan-out of {self.activity_id} to {len(self.user_ids)} users"
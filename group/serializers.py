@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from user.serializers import UserMiniProfileSerializer
+from user.serializers import UserMiniProfileSerializer, fast_user_mini_profile, user_mini_profile_values
 from utils.utils import UserUtils
 from .models import *
 from rest_framework.serializers import ValidationError
@@ -52,6 +52,7 @@ class GroupEditSerializer(serializers.Serializer):
     name = serializers.CharField(max_length = 50, required = False)
     description = serializers.CharField(required = False)
     icon = serializers.FileField(required = False)
+    strategy = serializers.ChoiceField(choices = Group.SIMPLIFY_STRATEGY_CHOICES, required = False)
         
     class Meta:
         fields = '__all__'
@@ -60,18 +61,20 @@ class GroupDeatilSerializer(serializers.ModelSerializer):
     balances = serializers.SerializerMethodField(read_only = True)
     group_picture = serializers.FileField(required = False, default = None, write_only = True)
     members = UserMiniProfileSerializer(read_only = True, many = True)
-    pending_members = PendingMembersSerializer(read_only = True, many = True)
+    pending_members = PendingMembersSerializer(source = 'pendingmembers_set', read_only = True, many = True)
     # total_expense
     # monthly_expense
     class Meta:
         model = Group
         fields = '__all__'
-        read_only_fields = ['id', 'total_spending','group_icon', 'admin', 'creator', 'created_at', 'is_deleted', 'members']
+        read_only_fields = ['id', 'total_spending','group_icon', 'admin', 'creator', 'created_at', 'is_deleted', 'members', 'fanout_on_read', 'sparse_balances', 'version']
 
 
     def get_balances(self, instance):
         from group.service import GroupService
-        return GroupService.format_group_balances_for_all_members(group=instance)
+        # members are prefetched by the detail view, reuse them for the balances
+        users = {member.id: member for member in instance.members.all()}
+        return GroupService.format_group_balances_for_all_members(group=instance, users=users)
 
     def create(self, validated_data):
         validated_data['admin'] = self.context['user']
@@ -86,5 +89,48 @@ class ActivitySerializer(serializers.ModelSerializer) :
     triggered_by = UserMiniProfileSerializer(read_only = True)
     class Meta:
         model = Activity
-        exclude = ['users']
-        
\ No newline at end of file
+        exclude = ['users', 'fanout_on_read']
+        
+
+# Fast, dict-producing twins of GroupBalenceSerializer and ActivitySerializer,
+# built from `.values()` rows. Output must stay byte-identical once rendered.
+_datetime = serializers.DateTimeField()
+
+GROUP_BALANCE_VALUES = ('id', 'friend_owes_id', 'friend_owns_id', 'balance', 'group_id')
+
+def fast_group_balance(row, users):
+    """
+    Args:
+    row (dict): GroupBalance (or SimplifiedBalance) row with GROUP_BALANCE_VALUES.
+    users (dict): user id -> fast_user_mini_profile dict.
+    """
+    return {
+        'id': row['id'],
+        'friend_owes': users[row['friend_owes_id']],
+        'friend_owns': users[row['friend_owns_id']],
+        'balance': row['balance'],
+        'group': row['group_id'],
+    }
+
+ACTIVITY_VALUES = (
+    'id', 'group_id', 'group__group_name', 'group__group_icon',
+    *user_mini_profile_values('triggered_by__'),
+    'activity_type', 'triggered_at', 'metadata',
+)
+
+def fast_activity(row):
+    group = None
+    if row['group_id'] is not None:
+        group = {
+            'id': str(row['group_id']),
+            'group_name': row['group__group_name'],
+            'group_icon': row['group__group_icon'],
+        }
+    return {
+        'id': str(row['id']),
+        'group': group,
+        'triggered_by': fast_user_mini_profile(row, 'triggered_by__'),
+        'activity_type': row['activity_type'],
+        'triggered_at': _datetime.to_representation(row['triggered_at']),
+        'metadata': row['metadata'],
+    }
@@ -1,21 +1,41 @@
 from collections import defaultdict
-from group.algorithms import UnionFind
-from group.serializers import GroupBalenceSerializer
-from user.serializers import UserMiniProfileSerializer
-from .models import Activity, GroupBalance
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from group.algorithms import UnionFind, min_cash_flow
+from group.cache import GroupCache
+from group.serializers import GROUP_BALANCE_VALUES, ACTIVITY_VALUES, fast_group_balance
+from user.serializers import UserMiniProfileSerializer, USER_MINI_PROFILE_FIELDS, fast_user_mini_profile
+from .models import Activity, ActivityOutbox, FriendBalance, Group, GroupBalance, Membership, SimplifiedBalance
 from django.db.models import Q
 from django.db import transaction
-from django.db.models import Sum, F, Case, When, Value
+from django.db.models import Sum, F, Case, When, Value, FloatField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from user.models import User
+
+# net balances within this distance of zero count as settled
+BALANCE_TOLERANCE = 0.005
+
 class GroupService:
     @staticmethod 
     def simplify_balances(group):
+        edges = list(group.balances.exclude(balance=0).values_list('friend_owes_id', 'friend_owns_id', 'balance'))
+
+        if group.simplify_strategy == 'spanning_tree':
+            return GroupService.spanning_tree_balances(group=group, edges=edges)
+
+        return [
+            SimplifiedBalance(group=group, friend_owes_id=debtor, friend_owns_id=creditor, balance=amount)
+            for debtor, creditor, amount in min_cash_flow(edges)
+        ]
+
+    @staticmethod
+    def spanning_tree_balances(group, edges):
         users = set()
-        edges = []
-        balances = group.balances.all()
-        for balance in balances:
-            users.add(balance.friend_owes_id)
-            users.add(balance.friend_owns_id)
-            edges.append((balance.balance, balance.friend_owes_id, balance.friend_owns_id))
+        for owes, owns, balance in edges:
+            users.add(owes)
+            users.add(owns)
         
         users = list(users)
         users_map = {user: idx for idx, user in enumerate(users)}
@@ -24,7 +44,7 @@ class GroupService:
         uf = UnionFind(n)
         
         # Step 3: Sort edges by balance (amount owed)
-        edges.sort()
+        edges = sorted((balance, owes, owns) for owes, owns, balance in edges)
         
         # Step 4: Apply Kruskal's algorithm to find the MST
         mst = []
@@ -35,19 +55,19 @@ class GroupService:
                 mst.append((cost, u, v))
                 total_cost += cost
         
-        # Step 5: Format the result into GroupBalance objects
+        # Step 5: Format the result into SimplifiedBalance objects
         simplified_balances = []
         for cost, u, v in mst:
             # Assuming balance is positive if u owes v, negative if v owes u
             if cost > 0:
-                simplified_balances.append(GroupBalance(
+                simplified_balances.append(SimplifiedBalance(
                     group=group,
                     friend_owes_id=u,
                     friend_owns_id=v,
                     balance=cost
                 ))
             else:
-                simplified_balances.append(GroupBalance(
+                simplified_balances.append(SimplifiedBalance(
                     group=group,
                     friend_owes_id=v,
                     friend_owns_id=u,
@@ -56,24 +76,98 @@ class GroupService:
         
         return simplified_balances
 
+    @staticmethod
+    def refresh_simplified_balances(group):
+        """
+        Rebuild the stored settle-up plan of a group.
+
+        Must be called whenever the group's GroupBalance rows or its simplification
+        settings change. Groups with simplification turned off keep no plan and
+        are skipped, their plan is cleared when simplification is turned off.
+        The group row is locked while a plan is rebuilt so concurrent writers
+        replace it one after the other.
+
+        Args:
+        group (Group): The group whose plan is rebuilt.
+
+        Returns:
+        list: The SimplifiedBalance rows now stored for the group.
+        """
+        if not group.is_simplified:
+            return []
+
+        with transaction.atomic():
+            list(Group.objects.select_for_update().filter(id=group.id).values_list('id', flat=True))
+            SimplifiedBalance.objects.filter(group=group).delete()
+            return SimplifiedBalance.objects.bulk_create(GroupService.simplify_balances(group=group))
+
+    @staticmethod
+    def bump_version(group):
+        """
+        Increment the version of a group with a database-side F() update, so
+        concurrent writers never hand out the same version twice.
+
+        Must be called inside the transaction of any write that changes what the
+        group detail, balances or expense list return.
+
+        Args:
+        group (Group | UUID): The group, or its id.
+
+        Returns:
+        int: Number of groups updated.
+        """
+        group_id = getattr(group, 'id', group)
+        return Group.objects.filter(id=group_id).update(version=F('version') + 1)
+
+    @staticmethod
+    def bump_member_group_versions(user):
+        """
+        Bump the version of every group of a user, e.g. after a profile edit
+        changed what the group payloads show for them.
+
+        Args:
+        user (User): The member.
+
+        Returns:
+        int: Number of groups updated.
+        """
+        return Group.objects.filter(members = user).update(version=F('version') + 1)
+
     @staticmethod
     def IsGroupSettledUp(group):
         """
         Check if all balances in the group are settled up.
 
+        Every member must have a zero net balance. Without simplification the
+        pairwise GroupBalance rows must be zero too: members can net to zero
+        while still owing each other in a cycle.
+
         Args:
         group (Group): The group object for which balances are to be checked.
 
         Returns:
         bool: True if all balances are settled (zero), False otherwise.
         """
-        return not GroupService.get_group_balances(group=group).filter(balance__ne=0).exists()
+        if Membership.objects.filter(group=group).filter(
+                Q(net_balance__gt=BALANCE_TOLERANCE) | Q(net_balance__lt=-BALANCE_TOLERANCE)).exists():
+            return False
+
+        if group.is_simplified:
+            return True
+
+        return not group.balances.filter(
+            Q(balance__gt=BALANCE_TOLERANCE) | Q(balance__lt=-BALANCE_TOLERANCE)).exists()
     
     @staticmethod
     def IsMemberSettledUp(group, user):
         """
         Check if a specific member in the group has settled up with all other members.
 
+        The member's net balance must be zero. Without simplification their
+        pairwise GroupBalance rows must be zero too; with simplification the
+        debts left on those rows offset each other and are moved onto the
+        other members when they leave (ExpenseService.reroute_member_balances).
+
         Args:
         group (Group): The group object in which balances are to be checked.
         user (User): The user whose balances with other members are to be checked.
@@ -81,38 +175,332 @@ class GroupService:
         Returns:
         bool: True if the user has settled up with all other members, False otherwise.
         """
-        all_balances = GroupService.get_group_balances(group=group)
-        member_balances = all_balances.filter(
-            Q(friend_owes=user) | Q(friend_owns=user),
-            balance__ne=0)
-        return member_balances.exists(), all_balances, member_balances
+        net_balance = Membership.objects.filter(group=group, user=user).values_list('net_balance', flat=True).first()
+        if net_balance is not None and abs(net_balance) > BALANCE_TOLERANCE:
+            return False
+
+        if group.is_simplified:
+            return True
+
+        return not group.balances.filter(Q(friend_owes=user) | Q(friend_owns=user)).filter(
+            Q(balance__gt=BALANCE_TOLERANCE) | Q(balance__lt=-BALANCE_TOLERANCE)).exists()
+
+    @staticmethod
+    def update_net_balances(group, deltas):
+        """
+        Apply net balance changes to the members of a group in one UPDATE.
+
+        Args:
+        group (Group): The group whose memberships are updated.
+        deltas (dict): user id -> amount added to that member's net balance.
+        """
+        deltas = {user: amount for user, amount in deltas.items() if amount}
+        if not deltas:
+            return
+
+        Membership.objects.filter(group=group, user_id__in=deltas.keys()).update(
+            net_balance=F('net_balance') + Case(
+                *[When(user_id=user, then=Value(amount)) for user, amount in deltas.items()],
+                default=Value(0.0),
+                output_field=FloatField(),
+                )
+            )
+
+    @staticmethod
+    def recompute_net_balances(groups=None, batch_size=1000):
+        """
+        Recompute Membership.net_balance from the GroupBalance rows.
+
+        Args:
+        groups (QuerySet): Groups to repair, all groups if None.
+        batch_size (int): Number of memberships written per UPDATE.
+
+        Returns:
+        int: Number of memberships whose net balance changed.
+        """
+        balances = GroupBalance.objects.all()
+        memberships = Membership.objects.all()
+        if groups is not None:
+            balances = balances.filter(group__in=groups)
+            memberships = memberships.filter(group__in=groups)
+
+        net = defaultdict(float)
+        for group, user, total in balances.values_list('group_id', 'friend_owns_id').annotate(total=Sum('balance')):
+            net[(group, user)] += total
+        for group, user, total in balances.values_list('group_id', 'friend_owes_id').annotate(total=Sum('balance')):
+            net[(group, user)] -= total
+
+        changed = []
+        for membership in memberships.only('id', 'group_id', 'user_id', 'net_balance').iterator(chunk_size=batch_size):
+            net_balance = round(net.get((membership.group_id, membership.user_id), 0), 2)
+            if membership.net_balance != net_balance:
+                membership.net_balance = net_balance
+                changed.append(membership)
+
+        Membership.objects.bulk_update(changed, ['net_balance'], batch_size=batch_size)
+        return len(changed)
+
+    @staticmethod
+    def update_friend_balances(debts):
+        """
+        Apply pairwise balance changes to the cross-group FriendBalance totals.
+
+        Missing rows are inserted with ignore_conflicts, then every touched row is
+        locked in primary key order before a single F() UPDATE, so writers of
+        different groups sharing a pair of users neither lose updates nor deadlock.
+
+        Args:
+        debts (dict): (debtor id, creditor id) -> amount the debtor now owes on top.
+        """
+        deltas = defaultdict(float)
+        for (debtor, creditor), amount in debts.items():
+            if not amount or debtor == creditor:
+                continue
+            deltas[(creditor, debtor)] += amount
+            deltas[(debtor, creditor)] -= amount
+        if not deltas:
+            return
+
+        # sorted inserts: writers sharing pairs wait on the unique index in the same order
+        FriendBalance.objects.bulk_create(
+            [FriendBalance(user_id=user, friend_id=friend) for user, friend in sorted(deltas, key=lambda pair: (str(pair[0]), str(pair[1])))],
+            ignore_conflicts=True)
+
+        pairs = Q()
+        for user, friend in deltas:
+            pairs |= Q(user_id=user, friend_id=friend)
+        rows = list(FriendBalance.objects.select_for_update().filter(pairs).order_by('id').values_list('id', 'user_id', 'friend_id'))
+
+        FriendBalance.objects.filter(id__in=[row[0] for row in rows]).update(
+            balance=F('balance') + Case(
+                *[When(id=id, then=Value(deltas[(user, friend)])) for id, user, friend in rows],
+                default=Value(0.0),
+                output_field=FloatField(),
+                ),
+            updated_at=timezone.now(),
+            )
+
+    @staticmethod
+    def aggregate_friend_balances(users):
+        """
+        Cross-group balances of users with each of their friends, summed from the
+        GroupBalance rows in one grouped query.
+
+        Args:
+        users (iterable): User ids.
+
+        Returns:
+        dict: (user id, friend id) -> amount the friend owes the user, in both
+            directions, for every pair with a balance row involving one of the users.
+        """
+        users = set(users)
+        totals = defaultdict(float)
+        for friend_owes, friend_owns, total in GroupBalance.objects.filter(
+                Q(friend_owes_id__in=users) | Q(friend_owns_id__in=users),
+                ).exclude(balance=0).order_by().values_list('friend_owes_id', 'friend_owns_id').annotate(total=Sum('balance')):
+            totals[(friend_owns, friend_owes)] += total
+            totals[(friend_owes, friend_owns)] -= total
+        return totals
+
+    @staticmethod
+    def recompute_friend_balances(users=None, batch_size=1000):
+        """
+        Rebuild the FriendBalance rows of users from the GroupBalance rows.
+
+        Args:
+        users (iterable): User ids to repair, all users with a balance if None.
+        batch_size (int): Number of rows written per query.
+
+        Returns:
+        int: Number of FriendBalance rows created or changed.
+        """
+        if users is None:
+            users = set(GroupBalance.objects.values_list('friend_owes_id', flat=True).distinct())
+            users |= set(GroupBalance.objects.values_list('friend_owns_id', flat=True).distinct())
+            users |= set(FriendBalance.objects.values_list('user_id', flat=True).distinct())
+
+        totals = GroupService.aggregate_friend_balances(users)
+        changed = []
+        for row in FriendBalance.objects.filter(Q(user_id__in=users) | Q(friend_id__in=users)).only('id', 'user_id', 'friend_id', 'balance').iterator(chunk_size=batch_size):
+            balance = round(totals.pop((row.user_id, row.friend_id), 0), 2)
+            if row.balance != balance:
+                row.balance = balance
+                changed.append(row)
+
+        FriendBalance.objects.bulk_update(changed, ['balance'], batch_size=batch_size)
+        created = FriendBalance.objects.bulk_create(
+            [FriendBalance(user_id=user, friend_id=friend, balance=round(balance, 2)) for (user, friend), balance in totals.items()],
+            batch_size=batch_size, ignore_conflicts=True)
+        return len(changed) + len(created)
+
+    @staticmethod
+    def get_friend_balances(user, friend=None):
+        """
+        The user's overall balance with each friend, read from FriendBalance.
+
+        Args:
+        user (User): The user.
+        friend (UUID): Optional friend id to restrict the result to.
+
+        Returns:
+        dict: 'owed' (total friends owe the user), 'owes' (total the user owes)
+            and 'balances' ({'friend', 'balance'}, balance > 0 means the friend
+            owes the user), largest first. Settled friends are left out.
+        """
+        rows = FriendBalance.objects.filter(user=user).exclude(
+            balance__gte=-BALANCE_TOLERANCE, balance__lte=BALANCE_TOLERANCE)
+        if friend is not None:
+            rows = rows.filter(friend_id=friend)
+        rows = list(rows.values_list('friend_id', 'balance'))
+
+        profiles = {row['id']: fast_user_mini_profile(row) for row in User.objects.filter(
+            id__in=[friend_id for friend_id, _ in rows]).values(*USER_MINI_PROFILE_FIELDS)}
+        balances = [{'friend': profiles[friend_id], 'balance': round(balance, 2)} for friend_id, balance in rows]
+        balances.sort(key=lambda balance: -abs(balance['balance']))
+
+        return {
+            'owed': round(sum((balance for _, balance in rows if balance > 0), 0.0), 2),
+            # summing the negated debts keeps an empty total at 0.0 rather than -0.0
+            'owes': round(sum((-balance for _, balance in rows if balance < 0), 0.0), 2),
+            'balances': balances,
+            }
 
     @staticmethod
-    def format_user_balence_in_the_group(group, user):
-        balances = GroupService.get_all_group_members_balences(group = group)
-        return balances.get(user, [])
+    def format_group_balances_for_all_members(group, users = None):
+        """
+        Serialized balances of the group, keyed by member id, cached per group
+        version (for a simplified group this is its settle-up plan).
+
+        Args:
+        group (Group): The group whose balances are formatted. Its `version` must
+            not be older than the state read (refresh it after a bump).
+        users (dict): Optional user id -> User map already loaded in the request.
+
+        Returns:
+        dict: str(user id) -> list of serialized balances involving that user.
+        """
+        return GroupCache.get_or_set(group.id, group.version, 'balances',
+            lambda: GroupService.serialize_group_balances(group = group, users = users))
 
     @staticmethod
-    def format_group_balances_for_all_members(group):
-        balances = GroupService.get_group_balances(group = group)
+    def serialize_group_balances(group, users = None):
+        """
+        Serialized balances of the group, keyed by member id, read from the database.
+
+        Rows are read with `.values()` and rendered by `fast_group_balance`, which
+        matches GroupBalenceSerializer output without its per-field overhead.
+
+        Args:
+        group (Group): The group whose balances are formatted.
+        users (dict): Optional user id -> User map already loaded in the request
+            (e.g. the prefetched members). Balance users missing from it are
+            loaded with one extra query.
+
+        Returns:
+        dict: str(user id) -> list of serialized balances involving that user.
+        """
+        balances = list(GroupService.get_group_balances(group = group).values(*GROUP_BALANCE_VALUES))
+
+        profiles = {}
+        for id, user in (users or {}).items():
+            profiles[id] = fast_user_mini_profile({field: getattr(user, field) for field in USER_MINI_PROFILE_FIELDS})
+
+        missing = {balance[key] for balance in balances for key in ('friend_owes_id', 'friend_owns_id')} - profiles.keys()
+        if missing:
+            for row in User.objects.filter(id__in = missing).values(*USER_MINI_PROFILE_FIELDS):
+                profiles[row['id']] = fast_user_mini_profile(row)
+
         all_balances = defaultdict(list)
         
         for balance in  balances:
-            friend_owes = balance.friend_owes
-            friend_owns = balance.friend_owns
-
-            balance = GroupBalenceSerializer(balance).data    
+            data = fast_group_balance(balance, profiles)
 
-            all_balances[friend_owes].append(balance)
-            all_balances[friend_owns].append(balance)
+            all_balances[str(balance['friend_owes_id'])].append(data)
+            all_balances[str(balance['friend_owns_id'])].append(data)
 
-        return all_balances
+        return dict(all_balances)
         
+    @staticmethod
+    def get_pairwise_balances(user, **filters):
+        """
+        Balances of a user with each friend, per group, aggregated in SQL.
+
+        Reads GroupBalance rows of non-simplified groups and the stored settle-up
+        plan of simplified ones, so the amounts match the group detail. Each
+        source is one grouped query with the amount signed from the user's side.
+
+        Args:
+        user (User): The user.
+        filters: Extra filters on the balance rows (e.g. group_id__in).
+
+        Returns:
+        list: {'group_id', 'friend', 'amount'} rows; amount > 0 means the friend
+            owes the user. Settled pairs are left out.
+        """
+        rows = []
+        for model, simplified in ((GroupBalance, False), (SimplifiedBalance, True)):
+            rows += model.objects.filter(
+                Q(friend_owes = user) | Q(friend_owns = user), group__is_simplified = simplified, **filters,
+                ).exclude(balance = 0).annotate(
+                friend = Case(When(friend_owes = user, then = F('friend_owns_id')), default = F('friend_owes_id')),
+                ).order_by().values('group_id', 'friend').annotate(
+                amount = Sum(Case(
+                    When(friend_owes = user, then = -F('balance')),
+                    default = F('balance'),
+                    output_field = FloatField(),
+                    )),
+                ).exclude(amount__gte = -BALANCE_TOLERANCE, amount__lte = BALANCE_TOLERANCE)
+        return rows
+
+    @staticmethod
+    def get_dashboard(user):
+        """
+        Every group of the user with their net position and per-friend balances.
+
+        Runs a fixed number of queries whatever the number of groups: the
+        memberships (net positions are maintained on Membership.net_balance),
+        the grouped pairwise balances and the friend profiles.
+
+        Args:
+        user (User): The user.
+
+        Returns:
+        dict: 'net_balance' over all groups and 'groups', newest first, each with
+            its 'net_balance' and 'balances' ({'friend', 'balance'}; balance > 0
+            means the friend owes the user).
+        """
+        memberships = Membership.objects.filter(user = user).order_by('-group__created_at', 'group_id').values(
+            'group_id', 'group__group_name', 'group__group_icon', 'group__is_simplified', 'net_balance')
+
+        balances = defaultdict(list)
+        pairwise = GroupService.get_pairwise_balances(user)
+        profiles = {row['id']: fast_user_mini_profile(row) for row in User.objects.filter(
+            id__in = {row['friend'] for row in pairwise}).values(*USER_MINI_PROFILE_FIELDS)}
+        for row in pairwise:
+            balances[row['group_id']].append({'friend': profiles[row['friend']], 'balance': round(row['amount'], 2)})
+
+        groups = []
+        for membership in memberships:
+            groups.append({
+                'id': str(membership['group_id']),
+                'group_name': membership['group__group_name'],
+                'group_icon': membership['group__group_icon'],
+                'is_simplified': membership['group__is_simplified'],
+                'net_balance': round(membership['net_balance'], 2),
+                'balances': sorted(balances[membership['group_id']], key = lambda balance: -abs(balance['balance'])),
+                })
+
+        return {
+            'net_balance': round(sum(group['net_balance'] for group in groups), 2),
+            'groups': groups,
+            }
+
     @staticmethod
     def get_group_balances(group):
         if group.is_simplified:
-            return GroupService.simplify_balances(group=group)
-        return group.balances.all()
+            return group.simplified_balances.all()
+        # zero and missing rows both mean the pair is settled
+        return group.balances.exclude(balance=0)
 
     @staticmethod
     def delete_group(user, group):
@@ -140,15 +528,163 @@ class GroupService:
 class ActivityService:
     @staticmethod
     def create_activity(type, users, triggered_by = None, group = None, metadata = {}):
+        """
+        Record an activity and queue its fan-out to `users`.
+
+        Only the Activity row and one ActivityOutbox row are written in the
+        caller's transaction; the Activity.users rows are written in bulk by
+        `drain_outbox`, which runs in-process after commit when
+        ACTIVITY_OUTBOX_INLINE_DRAIN is enabled, or from the
+        `drain_activity_outbox` management command.
+
+        Group activities addressed to more than ACTIVITY_FANOUT_ON_READ_THRESHOLD
+        users switch the group to fan-out-on-read: the activity is stored once and
+        `get_activity_streams` merges it into the members' feeds. Recipients who
+        are not members of the group still get it fanned out on write.
+        """
+        if hasattr(users, 'values_list'):
+            user_ids = [str(id) for id in users.values_list('id', flat=True)]
+        else:
+            user_ids = [str(user.id) for user in users]
+
+        fanout_on_read = group is not None and (
+            group.fanout_on_read or len(user_ids) > getattr(settings, 'ACTIVITY_FANOUT_ON_READ_THRESHOLD', 100))
+        if fanout_on_read and not group.fanout_on_read:
+            group.fanout_on_read = True
+            Group.objects.filter(id = group.id).update(fanout_on_read = True)
+
+        if fanout_on_read:
+            # only current members read the group stream, anyone else (e.g. a
+            # dropped invitee) still gets the activity fanned out on write
+            member_ids = {str(id) for id in Membership.objects.filter(group = group, user_id__in = user_ids).values_list('user_id', flat = True)}
+            ActivityService.increment_unseen({1: list(member_ids)})
+            user_ids = [id for id in user_ids if id not in member_ids]
+
         activity = Activity.objects.create(
             activity_type = type,
             group = group,
             triggered_by = triggered_by,
             metadata = metadata,
+            fanout_on_read = fanout_on_read,
             )
-        
-        activity.users.add(*users)
+
+        if user_ids:
+            ActivityOutbox.objects.create(activity = activity, user_ids = user_ids)
+            if getattr(settings, 'ACTIVITY_OUTBOX_INLINE_DRAIN', False):
+                transaction.on_commit(ActivityService.schedule_drain)
+
         return activity
-    
 
-    
\ No newline at end of file
+    @staticmethod
+    def increment_unseen(by_count):
+        """
+        Bump User.unseen_total_activities with one F() UPDATE per distinct increment.
+
+        Args:
+        by_count (dict): increment -> list of user ids receiving it.
+        """
+        for count, user_ids in by_count.items():
+            if user_ids:
+                User.objects.filter(id__in = user_ids).update(
+                    unseen_total_activities = Coalesce(F('unseen_total_activities'), 0) + count)
+
+    @staticmethod
+    def get_unseen_count(user):
+        """
+        The unseen activity counter of a user, read from the database: request.user
+        may be a cached copy (CachedTokenAuthentication) with a stale counter.
+        """
+        return User.objects.filter(id = user.id).values_list('unseen_total_activities', flat = True).first() or 0
+
+    @staticmethod
+    def mark_activities_seen(user):
+        user.unseen_total_activities = 0
+        User.objects.filter(id = user.id).update(unseen_total_activities = 0)
+
+    @staticmethod
+    def get_activity_streams(user):
+        """
+        The activity streams that make up a user's feed.
+
+        One stream holds the activities fanned out to the user on write; every
+        fan-out-on-read group the user belongs to adds the stream of its group
+        activities since the user joined. Each stream is ordered newest first on
+        (triggered_at, id) so the feed paginator can k-way merge them.
+
+        Returns:
+        list: Activity `.values(*ACTIVITY_VALUES)` querysets.
+        """
+        ordering = ('-triggered_at', '-id')
+        streams = [user.activites.order_by(*ordering).values(*ACTIVITY_VALUES)]
+
+        memberships = Membership.objects.filter(user = user, group__fanout_on_read = True).values_list('group_id', 'date_joined')
+        for group_id, date_joined in memberships:
+            streams.append(Activity.objects.filter(
+                group_id = group_id, fanout_on_read = True, triggered_at__gte = date_joined,
+                ).order_by(*ordering).values(*ACTIVITY_VALUES))
+
+        return streams
+
+    @staticmethod
+    def schedule_drain():
+        global _outbox_executor
+        if _outbox_executor is None:
+            _outbox_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ACTIVITY_OUTBOX_WORKERS', 2), thread_name_prefix='activity-outbox')
+        _outbox_executor.submit(ActivityService.drain_outbox_in_thread)
+
+    @staticmethod
+    def drain_outbox_in_thread():
+        try:
+            ActivityService.drain_outbox()
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def drain_outbox(batch_size = 500):
+        """
+        Deliver pending activities to their users.
+
+        Outbox rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+        workers can drain concurrently, and each batch is written with one
+        bulk_create of Activity.users through rows. Recipients that no longer
+        exist are skipped.
+
+        Args:
+        batch_size (int): Outbox rows handled per transaction.
+
+        Returns:
+        int: Number of outbox rows delivered.
+        """
+        delivered = 0
+        Through = Activity.users.through
+        while True:
+            with transaction.atomic():
+                entries = list(ActivityOutbox.objects.select_for_update(skip_locked = True).order_by('id')[:batch_size])
+                if not entries:
+                    return delivered
+
+                # recipients deleted since the activity was queued are dropped: their
+                # through rows would violate the foreign key and block the outbox forever
+                recipients = {user_id for entry in entries for user_id in entry.user_ids}
+                existing = {str(id) for id in User.objects.filter(id__in = recipients).values_list('id', flat = True)}
+
+                Through.objects.bulk_create(
+                    [Through(activity_id = entry.activity_id, user_id = user_id) for entry in entries for user_id in entry.user_ids if user_id in existing],
+                    ignore_conflicts = True,
+                    )
+
+                received = defaultdict(int)
+                for entry in entries:
+                    for user_id in entry.user_ids:
+                        if user_id in existing:
+                            received[user_id] += 1
+                by_count = defaultdict(list)
+                for user_id, count in received.items():
+                    by_count[count].append(user_id)
+                ActivityService.increment_unseen(by_count)
+
+                ActivityOutbox.objects.filter(id__in = [entry.id for entry in entries]).delete()
+                delivered += len(entries)
+
+
+_outbox_executor = None
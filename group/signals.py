@@ -1,9 +1,12 @@
 from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.db.models import Q
 from user.serializers import UserMiniProfileSerializer
 from utils.utils import CommonUtils
 from .models import GroupBalance, Membership, Group, PendingMembers
+from .cache import GroupCache
 from .service import ActivityService, GroupService
+from expense.service import ExpenseService
 
 
 @receiver(pre_delete, sender=Group)
@@ -25,6 +28,8 @@ def check_settle_up_before_group_deletion(sender, instance, **kwargs):
     if instance.group_icon:
          CommonUtils.delete_media_from_cloudinary([instance.group_icon])
 
+    GroupCache.invalidate(instance)
+
 @receiver(pre_delete, sender=Membership)
 def check_settle_up_before_leaving_group(sender, instance, **kwargs):
     """
@@ -37,15 +42,21 @@ def check_settle_up_before_leaving_group(sender, instance, **kwargs):
 
     Raises:
     ValueError: If the member has outstanding balances in the group, prevents leaving the group.
+
+    Notes:
+    Skipped while the whole group is being deleted, its settle-up was checked already.
     """
-    is_settled, all_balances, member_balances = GroupService.IsMemberSettledUp(group = instance.group, user=instance.user)
-    
-    if not is_settled:
-        raise ValueError("Cannot leave group with outstanding balances: outstanding balances  will be calculated with SIMPLIFY feature OFF")
+    if isinstance(kwargs.get('origin'), Group):
+        return
+
+    if not GroupService.IsMemberSettledUp(group = instance.group, user=instance.user):
+        raise ValueError("Cannot leave group with outstanding balances.")
 
-    all_balances.save()
-    member_balances.delete()
-    instance.group.pending_members.filter(invited_by = instance.user).delete()
+    if instance.group.is_simplified:
+        ExpenseService.reroute_member_balances(group = instance.group, user = instance.user)
+
+    instance.group.balances.filter(Q(friend_owes = instance.user) | Q(friend_owns = instance.user)).delete()
+    PendingMembers.objects.filter(group = instance.group, invited_by = instance.user).delete()
     
 @receiver(pre_save, sender=Membership)
 def create_frienships_before_membership(sender, instance, **kwargs):
@@ -60,18 +71,37 @@ def create_frienships_before_membership(sender, instance, **kwargs):
     Notes:
     Checks if the instance is new (not yet saved to the database) and creates friendships
     between the new member and existing members of the group.
+    Groups with `sparse_balances` skip this: their rows are created by the expense
+    write path once two members actually have a non-zero balance.
     """
-    members = instance.group.members
-    if not instance.pk and members:
-        balance = []
-        for member in members:
-            balance.append(GroupBalance(group = instance.group, friend_owes=member.user, friend_owns=instance.user))
-        
-        if balance:
-            GroupBalance.objects.bulk_create(balance)
+    if not instance._state.adding or instance.group.sparse_balances:
+        return
+
+    balance = []
+    for member in instance.group.members.exclude(id = instance.user_id):
+        balance.append(GroupBalance(group = instance.group, friend_owes=member, friend_owns=instance.user))
+    
+    if balance:
+        GroupBalance.objects.bulk_create(balance, ignore_conflicts = True)
+
+@receiver(post_delete, sender = Membership)
+def refresh_simplified_balances_after_leaving_group(sender, instance, **kwargs):
+    """
+    Signal receiver to rebuild the stored simplified plan and bump the group
+    version once a member has left. Skipped while the whole group is being deleted.
+    """
+    if isinstance(kwargs.get('origin'), Group):
+        return
+
+    GroupService.refresh_simplified_balances(group = instance.group)
+    GroupService.bump_version(instance.group_id)
 
 @receiver(post_save, sender = Membership)
 def member_joined_activity(sender, instance, created, **kwargs):
+    if created:
+        GroupService.refresh_simplified_balances(group = instance.group)
+        GroupService.bump_version(instance.group_id)
+
     if created and instance.group.members.count() > 1:
         activity = ActivityService.create_activity(
             type = 'member_joined',
@@ -106,6 +136,7 @@ def group_created_activity(sender, instance, created, **kwargs):
 @receiver(post_save, sender = PendingMembers)
 def group_invitation_sent_activity(sender, instance, created, **kwargs):
     if created:
+        GroupService.bump_version(instance.group_id)
         activity = ActivityService.create_activity(
             type = 'member_invited',
             group = instance.group,
@@ -117,4 +148,15 @@ def group_invitation_sent_activity(sender, instance, created, **kwargs):
                     'id' : str(instance.user.id),
                                  },
                 },
-            )
\ No newline at end of file
+            )
+
+@receiver(post_delete, sender = PendingMembers)
+def invitation_removed_version(sender, instance, **kwargs):
+    """
+    Signal receiver to bump the group version once an invitation is accepted or dropped.
+    Skipped while the whole group is being deleted.
+    """
+    if isinstance(kwargs.get('origin'), Group):
+        return
+
+    GroupService.bump_version(instance.group_id)
@@ -1,3 +1,475 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.conf import settings
+import math
+from datetime import timedelta
+from django.db import transaction
+import random
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from expense.service import ExpenseService
+from group.algorithms import min_cash_flow, net_positions
+from group.cache import GroupCache
+from group.models import Activity, ActivityOutbox, FriendBalance, Group, GroupBalance, Membership, PendingMembers
+from group.service import ActivityService, GroupService
+from user.models import User
 
-# Create your tests here.
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class GroupDetailQueryBudgetTests(TestCase):
+    """
+    The group detail endpoint runs a constant number of queries whatever the
+    group size. Payloads are never cached inside a transaction, so every
+    request of these tests takes the uncached path.
+    """
+    # version lookup, group, members, pending invitations, balances
+    QUERIES = 5
+
+    def setUp(self):
+        caches[settings.GROUP_CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+    def create_group(self, size):
+        users = [User.objects.create(username=f'member-{size}-{i}', email=f'member-{size}-{i}@example.com') for i in range(size + 1)]
+        group = Group.objects.create(group_name=f'group of {size}', admin=users[0], creator=users[0])
+        for user in users[1:size]:
+            Membership.objects.create(user=user, group=group, added_by=users[0])
+        PendingMembers.objects.create(group=group, user=users[size], invited_by=users[0])
+
+        # a non-zero balance between the creator and every other member
+        ExpenseService.apply_balance_deltas(group=group, debts={(user.id, users[0].id): 10.0 for user in users[1:size]})
+        return group, users[0]
+
+    def assertDetailQueries(self, size):
+        group, user = self.create_group(size)
+        self.client.force_authenticate(user)
+        url = reverse('group-details', kwargs={'id': group.id})
+
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['members']), size)
+
+    def test_small_group(self):
+        self.assertDetailQueries(3)
+
+    def test_large_group(self):
+        self.assertDetailQueries(30)
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class GroupInternalFieldsTests(TestCase):
+    """
+    The storage flags and the version of a group are managed by the server:
+    clients can read them but not set them.
+    """
+    def test_create_ignores_internal_fields(self):
+        user = User.objects.create(username='creator', email='creator@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post(reverse('create-group'), {
+            'group_name': 'trip',
+            'fanout_on_read': True,
+            'sparse_balances': False,
+            'version': 99,
+            })
+        self.assertEqual(response.status_code, 201)
+        group = Group.objects.get(creator=user)
+        self.assertEqual((group.fanout_on_read, group.sparse_balances), (False, True))
+        self.assertNotEqual(group.version, 99)
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class GroupCacheTests(TransactionTestCase):
+    """
+    Group detail payloads are cached per group version. A TransactionTestCase,
+    since payloads computed inside a transaction are never stored.
+    """
+    def setUp(self):
+        GroupCache.get_cache().clear()
+        self.user, self.friend = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('user', 'friend')]
+        self.group = Group.objects.create(group_name='trip', admin=self.user, creator=self.user)
+        Membership.objects.create(user=self.friend, group=self.group, added_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('group-details', kwargs={'id': self.group.id})
+
+    def get_detail(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_hits_and_misses(self):
+        GroupCache.reset_stats()
+        first = self.get_detail()
+        # only the version lookup runs on a hit
+        with self.assertNumQueries(1):
+            second = self.get_detail()
+        self.assertEqual(first, second)
+        # the first request misses the detail and the balances embedded in it
+        self.assertEqual(GroupCache.stats(), {'hits': 1, 'misses': 2, 'hit_rate': 0.3333})
+
+        GroupCache.reset_stats()
+        self.assertEqual(GroupCache.stats(), {'hits': 0, 'misses': 0, 'hit_rate': None})
+
+    def test_version_bump_serves_a_fresh_payload(self):
+        self.assertEqual(self.get_detail()['group_name'], 'trip')
+
+        Group.objects.filter(id=self.group.id).update(group_name='holiday')
+        self.assertEqual(self.get_detail()['group_name'], 'trip')
+        GroupService.bump_version(self.group)
+        self.assertEqual(self.get_detail()['group_name'], 'holiday')
+
+    def test_nothing_is_stored_inside_a_transaction(self):
+        with transaction.atomic():
+            GroupCache.get_or_set(self.group.id, 1, 'detail', lambda: 'payload')
+        self.assertIsNone(GroupCache.get_cache().get(GroupCache.key(self.group.id, 1, 'detail')))
+
+        GroupCache.get_or_set(self.group.id, 1, 'detail', lambda: 'payload')
+        self.assertEqual(GroupCache.get_cache().get(GroupCache.key(self.group.id, 1, 'detail')), 'payload')
+
+    def test_group_delete_invalidates(self):
+        self.get_detail()
+        self.group.refresh_from_db()
+        key = GroupCache.key(self.group.id, self.group.version, 'detail')
+        self.assertIsNotNone(GroupCache.get_cache().get(key))
+
+        self.group.delete()
+        self.assertIsNone(GroupCache.get_cache().get(key))
+
+
+class MinCashFlowTests(SimpleTestCase):
+    """
+    Settle-up plans of min_cash_flow: few transfers, every net position preserved.
+    """
+    def assertSettles(self, edges, transfers):
+        expected = {member: amount for member, amount in net_positions(edges).items() if amount}
+        settled = net_positions(transfers)
+        for member in set(expected) | set(settled):
+            self.assertAlmostEqual(settled.get(member, 0), expected.get(member, 0), places=2)
+
+    def test_no_debts(self):
+        self.assertEqual(min_cash_flow([]), [])
+        self.assertEqual(min_cash_flow([('a', 'b', 0)]), [])
+
+    def test_chain_collapses_to_one_transfer(self):
+        self.assertEqual(min_cash_flow([('a', 'b', 10), ('b', 'c', 10)]), [('a', 'c', 10)])
+
+    def test_offsetting_debts_cancel(self):
+        self.assertEqual(min_cash_flow([('a', 'b', 10), ('b', 'c', 10), ('c', 'a', 10)]), [])
+
+    def test_random_graphs(self):
+        rnd = random.Random(0)
+        for _ in range(200):
+            members = [f'm{i}' for i in range(rnd.randint(2, 12))]
+            edges = []
+            for _ in range(rnd.randint(1, 40)):
+                owes, owns = rnd.sample(members, 2)
+                edges.append((owes, owns, round(rnd.uniform(-100, 100), 2)))
+
+            transfers = min_cash_flow(edges)
+            involved = {member for member, amount in net_positions(edges).items() if amount}
+            self.assertLessEqual(len(transfers), max(len(involved) - 1, 0))
+            for debtor, creditor, amount in transfers:
+                self.assertNotEqual(debtor, creditor)
+                self.assertGreater(amount, 0)
+                self.assertEqual(amount, round(amount, 2))
+            self.assertSettles(edges, transfers)
+
+    def test_residuals_below_a_cent_are_settled(self):
+        # nets of +-0.001 round to zero: nobody has to pay
+        self.assertEqual(min_cash_flow([('a', 'b', 10.001), ('b', 'a', 10)]), [])
+
+    def test_thirds_are_rounded_to_cents(self):
+        edges = [('a', 'c', 10 / 3), ('b', 'c', 10 / 3), ('c', 'd', 10 / 3)]
+        transfers = min_cash_flow(edges)
+        self.assertEqual(len(transfers), 2)
+        self.assertEqual({amount for _, _, amount in transfers}, {3.33})
+        self.assertSettles(edges, transfers)
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class LeaveGroupTests(TestCase):
+    """
+    Leaving and deleting groups with outstanding or offsetting debts.
+    """
+    def setUp(self):
+        self.leaver, self.creditor, self.debtor = [
+            User.objects.create(username=name, email=f'{name}@example.com') for name in ('leaver', 'creditor', 'debtor')]
+
+    def create_group(self, is_simplified):
+        group = Group.objects.create(group_name='trip', admin=self.leaver, creator=self.leaver, is_simplified=is_simplified)
+        for user in (self.creditor, self.debtor):
+            Membership.objects.create(user=user, group=group, added_by=self.leaver)
+        # the leaver owes the creditor 10 and is owed 10 by the debtor: a zero net balance
+        ExpenseService.apply_balance_deltas(group=group, debts={
+            (self.leaver.id, self.creditor.id): 10.0,
+            (self.debtor.id, self.leaver.id): 10.0,
+            })
+        return group
+
+    def net_balances(self, group):
+        return dict(Membership.objects.filter(group=group).values_list('user__username', 'net_balance'))
+
+    def friend_balance(self, user, friend):
+        return FriendBalance.objects.filter(user=user, friend=friend).values_list('balance', flat=True).first() or 0
+
+    def test_offsetting_debts_block_leaving_without_simplification(self):
+        group = self.create_group(is_simplified=False)
+        self.assertFalse(GroupService.IsMemberSettledUp(group, self.leaver))
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            Membership.objects.get(group=group, user=self.leaver).delete()
+        self.assertTrue(Membership.objects.filter(group=group, user=self.leaver).exists())
+        self.assertEqual(group.balances.exclude(balance=0).count(), 2)
+
+    def test_leaving_a_simplified_group_reroutes_offsetting_debts(self):
+        group = self.create_group(is_simplified=True)
+        self.assertTrue(GroupService.IsMemberSettledUp(group, self.leaver))
+
+        Membership.objects.get(group=group, user=self.leaver).delete()
+
+        balances = list(group.balances.exclude(balance=0).values_list('friend_owes_id', 'friend_owns_id', 'balance'))
+        self.assertEqual(len(balances), 1)
+        friend_owes, friend_owns, balance = balances[0]
+        if friend_owes == self.creditor.id:
+            friend_owes, friend_owns, balance = friend_owns, friend_owes, -balance
+        self.assertEqual((friend_owes, friend_owns, balance), (self.debtor.id, self.creditor.id, 10.0))
+
+        self.assertEqual(self.net_balances(group), {'creditor': 10.0, 'debtor': -10.0})
+        self.assertEqual(self.friend_balance(self.creditor, self.debtor), 10.0)
+        self.assertEqual(self.friend_balance(self.leaver, self.creditor), 0)
+        self.assertEqual(self.friend_balance(self.leaver, self.debtor), 0)
+        self.assertEqual(list(group.simplified_balances.values_list('friend_owes_id', 'friend_owns_id', 'balance')),
+                         [(self.debtor.id, self.creditor.id, 10.0)])
+
+    def test_member_with_a_debt_cannot_leave(self):
+        group = self.create_group(is_simplified=True)
+        ExpenseService.apply_balance_deltas(group=group, debts={(self.leaver.id, self.creditor.id): 5.0})
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            Membership.objects.get(group=group, user=self.leaver).delete()
+
+    def test_leaving_drops_sent_invitations(self):
+        group = self.create_group(is_simplified=True)
+        invitee = User.objects.create(username='invitee', email='invitee@example.com')
+        PendingMembers.objects.create(group=group, user=invitee, invited_by=self.leaver)
+
+        Membership.objects.get(group=group, user=self.leaver).delete()
+        self.assertFalse(PendingMembers.objects.filter(group=group).exists())
+
+    def test_only_settled_groups_can_be_deleted(self):
+        group = self.create_group(is_simplified=False)
+        with self.assertRaises(ValueError), transaction.atomic():
+            group.delete()
+
+        ExpenseService.apply_balance_deltas(group=group, debts={
+            (self.creditor.id, self.leaver.id): 10.0,
+            (self.leaver.id, self.debtor.id): 10.0,
+            })
+        self.assertTrue(GroupService.IsGroupSettledUp(group))
+        group.delete()
+        self.assertFalse(Group.objects.filter(id=group.id).exists())
+        self.assertFalse(GroupBalance.objects.filter(group_id=group.id).exists())
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False, ACTIVITY_FANOUT_ON_READ_THRESHOLD=2)
+class ActivityFeedPaginationTests(TestCase):
+    """
+    Walking the activity feed page by page through the next links returns
+    every activity once, newest first, across the user's own stream and the
+    streams of fan-out-on-read groups.
+    """
+    def setUp(self):
+        self.user, self.friend, self.other = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('user', 'friend', 'other')]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now() + timedelta(minutes=1)
+
+    def create_activities(self, count, users, group=None, seconds=None):
+        # activities one second apart, or all at the same instant when `seconds` is given
+        activities = []
+        for i in range(count):
+            activity = ActivityService.create_activity(type='expense_added', users=users, group=group, metadata={'n': i})
+            triggered_at = self.start + timedelta(seconds=i if seconds is None else seconds)
+            Activity.objects.filter(id=activity.id).update(triggered_at=triggered_at)
+            activities.append((triggered_at, activity.id))
+        ActivityService.drain_outbox()
+        return activities
+
+    def walk_feed(self, page_size):
+        pages = []
+        url = reverse('list-groups') + f'?page_size={page_size}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([activity['id'] for activity in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def expected(self, activities):
+        return [str(id) for _, id in sorted(activities, reverse=True)]
+
+    def test_cursor_round_trip(self):
+        activities = self.create_activities(7, [self.user, self.friend])
+        pages = self.walk_feed(page_size=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected(activities))
+
+    def test_activities_at_the_same_instant(self):
+        # the id breaks ties: no activity is skipped or repeated at a page boundary
+        activities = self.create_activities(5, [self.user], seconds=0)
+        self.assertEqual(sum(self.walk_feed(page_size=2), []), self.expected(activities))
+
+    def test_user_and_group_streams_are_merged(self):
+        group = Group.objects.create(group_name='trip', admin=self.user, creator=self.user)
+        for user in (self.friend, self.other):
+            Membership.objects.create(user=user, group=group, added_by=self.user)
+        ActivityService.drain_outbox()
+        Activity.objects.all().delete()
+
+        own = self.create_activities(4, [self.user])
+        self.start += timedelta(milliseconds=500)
+        shared = self.create_activities(4, group.members.all(), group=group)
+        group.refresh_from_db()
+        self.assertTrue(group.fanout_on_read)
+        self.assertFalse(Activity.users.through.objects.filter(activity_id__in=[id for _, id in shared]).exists())
+
+        self.assertEqual(len(ActivityService.get_activity_streams(self.user)), 2)
+        pages = self.walk_feed(page_size=3)
+        self.assertEqual(sum(pages, []), self.expected(own + shared))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list-groups') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class ActivityOutboxTests(TestCase):
+    """
+    Activities are queued in the outbox and delivered to their users by drain_outbox.
+    """
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user-{i}', email=f'user-{i}@example.com') for i in range(3)]
+
+    def unseen(self):
+        return [ActivityService.get_unseen_count(user) for user in self.users]
+
+    def test_activity_is_delivered_on_drain(self):
+        activity = ActivityService.create_activity(type='expense_added', users=self.users[:2], triggered_by=self.users[2])
+        self.assertEqual(ActivityOutbox.objects.count(), 1)
+        self.assertFalse(activity.users.exists())
+
+        self.assertEqual(ActivityService.drain_outbox(), 1)
+        self.assertEqual(set(activity.users.all()), set(self.users[:2]))
+        self.assertEqual(self.unseen(), [1, 1, 0])
+        self.assertFalse(ActivityOutbox.objects.exists())
+        self.assertEqual(ActivityService.drain_outbox(), 0)
+
+    def test_drain_in_batches(self):
+        for i in range(5):
+            ActivityService.create_activity(type='expense_added', users=self.users[:i % 3 + 1])
+
+        self.assertEqual(ActivityService.drain_outbox(batch_size=2), 5)
+        self.assertFalse(ActivityOutbox.objects.exists())
+        self.assertEqual(self.unseen(), [5, 3, 1])
+        self.assertEqual([user.activites.count() for user in self.users], [5, 3, 1])
+
+    def test_deleted_recipients_are_skipped(self):
+        activity = ActivityService.create_activity(type='expense_added', users=self.users)
+        deleted = self.users.pop()
+        deleted.delete()
+
+        self.assertEqual(ActivityService.drain_outbox(), 1)
+        self.assertEqual(set(activity.users.all()), set(self.users))
+        self.assertFalse(ActivityOutbox.objects.exists())
+
+    @override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=True)
+    def test_inline_drain_waits_for_commit(self):
+        with mock.patch.object(ActivityService, 'schedule_drain') as schedule_drain:
+            with self.captureOnCommitCallbacks(execute=True):
+                ActivityService.create_activity(type='expense_added', users=self.users)
+                schedule_drain.assert_not_called()
+        schedule_drain.assert_called_once_with()
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False, ACTIVITY_FANOUT_ON_READ_THRESHOLD=2)
+class UnseenActivityCountTests(TestCase):
+    """
+    The unseen badge counts activities delivered on write and on read, and is
+    reset by marking the activities seen.
+    """
+    def setUp(self):
+        self.user, self.friend, self.other = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('user', 'friend', 'other')]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unseen(self):
+        response = self.client.get(reverse('unseen-activities'))
+        self.assertEqual(response.status_code, 200)
+        return response.data['unseen_total_activities']
+
+    def test_counter(self):
+        self.assertEqual(self.unseen(), 0)
+        for _ in range(3):
+            ActivityService.create_activity(type='expense_added', users=[self.user, self.friend])
+        # nothing is counted before the outbox is drained
+        self.assertEqual(self.unseen(), 0)
+        ActivityService.drain_outbox()
+        self.assertEqual(self.unseen(), 3)
+
+        response = self.client.post(reverse('mark-activities-seen'))
+        self.assertEqual(response.data, {'unseen_total_activities': 0})
+        self.assertEqual(self.unseen(), 0)
+        self.assertEqual(ActivityService.get_unseen_count(self.friend), 3)
+
+    def test_fanout_on_read_activities_are_counted_at_once(self):
+        group = Group.objects.create(group_name='trip', admin=self.friend, creator=self.friend, fanout_on_read=True)
+        Membership.objects.create(user=self.user, group=group, added_by=self.friend)
+        ActivityService.drain_outbox()
+        self.client.post(reverse('mark-activities-seen'))
+
+        ActivityService.create_activity(type='expense_added', users=group.members.all(), group=group)
+        self.assertEqual(self.unseen(), 1)
+        self.assertFalse(ActivityOutbox.objects.exists())
+
+    def test_count_is_read_from_the_database(self):
+        # request.user can be a cached copy with a stale counter
+        ActivityService.create_activity(type='expense_added', users=[self.user])
+        ActivityService.drain_outbox()
+        self.assertEqual(self.user.unseen_total_activities, 0)
+        self.assertEqual(self.unseen(), 1)
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class FriendBalancesTests(TestCase):
+    """
+    Overall balances with friends, summed over all shared groups.
+    """
+    def setUp(self):
+        self.user, self.friend, self.other = [User.objects.create(username=name, email=f'{name}@example.com') for name in ('user', 'friend', 'other')]
+        self.group = Group.objects.create(group_name='trip', admin=self.user, creator=self.user)
+        for user in (self.friend, self.other):
+            Membership.objects.create(user=user, group=self.group, added_by=self.user)
+
+    def test_totals(self):
+        ExpenseService.apply_balance_deltas(group=self.group, debts={
+            (self.friend.id, self.user.id): 12.5,
+            (self.user.id, self.other.id): 2.5,
+            })
+        balances = GroupService.get_friend_balances(self.user)
+        self.assertEqual((balances['owed'], balances['owes']), (12.5, 2.5))
+        self.assertEqual([(balance['friend']['username'], balance['balance']) for balance in balances['balances']],
+                         [('friend', 12.5), ('other', -2.5)])
+
+    def test_nothing_owed_is_positive_zero(self):
+        ExpenseService.apply_balance_deltas(group=self.group, debts={(self.friend.id, self.user.id): 10.0})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('friend-balances'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(math.copysign(1, response.data['owes']), 1)
+        self.assertEqual(GroupService.get_friend_balances(self.friend)['owed'], 0.0)
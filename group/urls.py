@@ -10,6 +10,10 @@ urlpatterns = [
     path('remove/<str:id>/', views.RemoveMemberFromGroupView.as_view(), name = 'leave-group'), # ID: MEMBER ID
     path('delete/<str:id>/', views.DeleteGroupView.as_view(), name = 'delete-group'),
     path('activity/list/', views.UserActivityListView.as_view(), name = 'list-groups'),
+    path('activity/unseen/', views.UnseenActivityCountView.as_view(), name = 'unseen-activities'),
+    path('activity/seen/', views.MarkActivitiesSeenView.as_view(), name = 'mark-activities-seen'),
+    path('dashboard/', views.DashboardView.as_view(), name = 'dashboard'),
+    path('friends/balances/', views.FriendBalancesView.as_view(), name = 'friend-balances'),
     path('<str:id>/', views.JoinedGroupDetailView.as_view(), name = 'group-details'),
     path('edit/<str:field>/<str:id>/', views.UpdateGroupDetailsView.as_view(), name = 'simplify-debts'),
     
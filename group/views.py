@@ -1,12 +1,16 @@
+import uuid
 from rest_framework import generics
 from rest_framework.response import Response
-from group.service import ActivityService
+from group.cache import GroupCache
+from group.service import ActivityService, GroupService
 from .serializers import *
 from rest_framework import permissions, status
 from utils.utils import CommonUtils
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser, FormParser
+from utils.pagination import ActivityFeedPagination
+from utils.conditional import GroupVersionETagMixin, group_etag
 # Create your views here.
 class CreateGroupView(generics.CreateAPIView):
     serializer_class = GroupDeatilSerializer
@@ -141,12 +145,56 @@ class JoinedGroupsListView(generics.ListAPIView):
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
-class JoinedGroupDetailView(generics.RetrieveAPIView):
+class DashboardView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Group'], 
+    operation_summary= "DASHBOARD", 
+    operation_description = 'PROVIDES ALL THE GROUPS OF THE CURRENT USER WITH THEIR NET POSITION AND BALANCES WITH EACH FRIEND IN ONE REQUEST.', 
+    ) 
+    def get(self, request, *args, **kwargs):
+        return Response(GroupService.get_dashboard(request.user), status=200)
+
+class FriendBalancesView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Group'], 
+    operation_summary= "BALANCES WITH FRIENDS", 
+    operation_description = 'PROVIDES HOW MUCH THE CURRENT USER OWES OR IS OWED BY EACH FRIEND ACROSS ALL SHARED GROUPS. FILTER ON ONE FRIEND WITH ?friend=<user_id>.', 
+    manual_parameters = [openapi.Parameter('friend', openapi.IN_QUERY, type = openapi.TYPE_STRING, required = False)],
+    ) 
+    def get(self, request, *args, **kwargs):
+        friend = request.query_params.get('friend', None)
+        if friend is not None:
+            try:
+                friend = uuid.UUID(friend)
+            except ValueError:
+                return Response({'error' : 'invalid friend id'}, status=400)
+
+        return Response(GroupService.get_friend_balances(request.user, friend = friend), status=200)
+
+class JoinedGroupDetailView(GroupVersionETagMixin, generics.RetrieveAPIView):
+    """
+    Group detail in a constant number of queries whatever the group size:
+    group, members, pending invitations and balances (the balance users are
+    taken from the prefetched members). Served with the group version as ETag,
+    an unchanged group is answered with 304, and cached per version otherwise.
+    """
     serializer_class = GroupDeatilSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
     def get_queryset(self):
-       return self.request.user.groups_membership.all()
+       return self.request.user.groups_membership.prefetch_related('members', 'pendingmembers_set')
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.group_version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        data = GroupCache.get_or_set(self.group_id, self.group_version, 'detail',
+            lambda: self.get_serializer(self.get_object()).data)
+        return Response(data)
     
     @swagger_auto_schema(tags = ['Group'], 
     operation_summary= "DETAILS OF A JOINED GROUPS", 
@@ -220,12 +268,19 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
             group = self.get_object()
             field = kwargs.get('field', None)
             print("request.data ===>", request.data)
-            if field not in ['name', 'description', 'icon', 'simplified']:
+            if field not in ['name', 'description', 'icon', 'simplified', 'strategy']:
                 return Response({'error': 'PAGE NOT FOUND'}, status=400)
             
 
             type = None
             icon = None
+            update_fields = {
+                'name' : 'group_name',
+                'description' : 'group_description',
+                'icon' : 'group_icon',
+                'simplified' : 'is_simplified',
+                'strategy' : 'simplify_strategy',
+                }
             metadata = {'updated_by' : {
                                 'username' : request.user.username, 
                                 'id' : str(request.user.id),
@@ -237,10 +292,17 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
             if field  == 'simplified':
                 type = 'group_simplified'
                 group.is_simplified =  not group.is_simplified   
-                from .service import GroupService
-                balances = GroupService.format_group_balances_for_all_members(group)
-                response = {'state': group.is_simplified, 'balances' : balances}
             
+            if field == 'strategy':
+                strategy = request.data['strategy']
+                if strategy not in dict(Group.SIMPLIFY_STRATEGY_CHOICES):
+                    return Response({'error': 'INVALID STRATEGY'}, status=400)
+
+                type = 'group_simplified'
+                group.simplify_strategy = strategy
+                metadata['strategy'] = strategy
+                response = {'strategy': group.simplify_strategy}
+
             if field == 'name' :
                 type = 'changed_group_name'
                 group.group_name = request.data['name']
@@ -248,7 +310,7 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
                 
             if field == 'description' :
                 type = 'changed_group_description'
-                group.description = request.data['description']
+                group.group_description = request.data['description']
             
             if field == 'icon' :
                 icon = CommonUtils.UploadMediaToCloud(request.data['icon'])
@@ -258,7 +320,14 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
                 
             try:    
                 with transaction.atomic():
-                    group.save()
+                    # only the edited field: a full save would write back a stale version
+                    group.save(update_fields = [update_fields[field]])
+                    if field in ['simplified', 'strategy']:
+                        if group.is_simplified:
+                            GroupService.refresh_simplified_balances(group)
+                        else:
+                            group.simplified_balances.all().delete()
+                    GroupService.bump_version(group)
                     ActivityService.create_activity(type=type, group = group, triggered_by= request.user, users=group.members.all(), metadata=metadata)
             
             except Exception as e:
@@ -266,7 +335,13 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
                     CommonUtils.delete_media_from_cloudinary([icon])
 
                 raise Exception(str(e))
-            return Response(response, status=status.HTTP_200_OK)
+
+            group.refresh_from_db(fields = ['version'])
+            if field == 'simplified':
+                balances = GroupService.format_group_balances_for_all_members(group)
+                response = {'state': group.is_simplified, 'balances' : balances}
+
+            return Response(response, status=status.HTTP_200_OK, headers = {'ETag' : group_etag(group.version)})
         
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -274,9 +349,15 @@ class UpdateGroupDetailsView(generics.UpdateAPIView):
 class UserActivityListView(generics.ListAPIView):
     serializer_class = ActivitySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ActivityFeedPagination
 
     def get_queryset(self):
-       return self.request.user.activites.all()
+       return self.request.user.activites.select_related('group', 'triggered_by')
+
+    def list(self, request, *args, **kwargs):
+        streams = ActivityService.get_activity_streams(request.user)
+        page = self.paginator.paginate_streams(streams, request, view=self)
+        return self.get_paginated_response([fast_activity(row) for row in page])
     
     @swagger_auto_schema(tags = ['Activity'], 
     operation_summary= "LIST OF ALL THE ACTIVITY", 
@@ -285,3 +366,26 @@ class UserActivityListView(generics.ListAPIView):
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+
+class UnseenActivityCountView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Activity'], 
+    operation_summary= "UNSEEN ACTIVITY COUNT", 
+    operation_description = 'PROVIDES ONLY THE NUMBER OF ACTIVITIES THE CURRENT USER HAS NOT SEEN YET. CHEAP ENOUGH TO POLL.', 
+    ) 
+    def get(self, request, *args, **kwargs):
+        return Response({'unseen_total_activities' : ActivityService.get_unseen_count(request.user)}, status=200)
+
+class MarkActivitiesSeenView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Activity'], 
+    operation_summary= "MARK ACTIVITIES SEEN", 
+    operation_description = 'RESETS THE UNSEEN ACTIVITY COUNT OF THE CURRENT USER.', 
+    ) 
+    def post(self, request, *args, **kwargs):
+        ActivityService.mark_activities_seen(request.user)
+        return Response({'unseen_total_activities' : 0}, status=200)
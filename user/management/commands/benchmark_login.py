@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from user.models import User
+from user.service import LoginService
+
+PASSWORD = 'Bench-passw0rd'
+
+
+def legacy_login(email, password):
+    # the login flow this service replaced: exists, authenticate, full save, get_or_create
+    if not User.objects.filter(email=email).exists():
+        return None
+    user = authenticate(password=password, username=email)
+    if user:
+        user.save()
+        token, created = Token.objects.get_or_create(user=user)
+        return token.key
+
+
+class Command(BaseCommand):
+    help = 'Report logins/sec and queries per login of the legacy login flow and LoginService.login.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Throwaway users to create.')
+        parser.add_argument('--logins', type=int, default=200, help='Logins per flow.')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads.')
+        parser.add_argument('--force', action='store_true', help='Run even when DEBUG is off.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to create benchmark users with DEBUG off, pass --force on a local database.')
+
+        # committed so the request threads see them, removed at the end
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f'login-bench-{i}', email=f'login-bench-{i}@example.com', password=password, is_verified=True)
+            for i in range(options['users'])])
+        emails = [user.email for user in users]
+        try:
+            for name, login in (('legacy', legacy_login), ('fast path', LoginService.login)):
+                with CaptureQueriesContext(connection) as queries:
+                    login(emails[0], PASSWORD)
+                    login(emails[0], PASSWORD)
+                rate = self.measure(login, emails, options['logins'], options['threads'])
+                self.stdout.write(f'{name:<10} {rate:8.1f} logins/sec  {len(queries) / 2:.0f} queries/login (token existing)')
+        finally:
+            Token.objects.filter(user__in=users).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def measure(self, login, emails, logins, threads):
+        def run(i):
+            try:
+                return login(emails[i % len(emails)], PASSWORD)
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(run, range(logins)))
+        return logins / (time.perf_counter() - start)
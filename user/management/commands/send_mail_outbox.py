@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from user.service import MailOutboxService
+
+
+class Command(BaseCommand):
+    help = 'Send the due mails of the mail outbox (OutgoingMail), retrying failed ones with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Mails sent per connection and transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = MailOutboxService.send_pending(batch_size=options['batch_size'])
+            if sent:
+                self.stdout.write(f'{sent} mails sent.')
+
+            if not options['loop']:
+                break
+            if not sent:
+                time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from user.service import CredentialService
+
+
+class Command(BaseCommand):
+    help = 'Delete expired password reset OTPs and mail verification tokens (ExpiringCredential).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per query.')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping instead of exiting after one pass.')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds to sleep between sweeps with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = CredentialService.sweep(batch_size=options['batch_size'])
+            if deleted:
+                self.stdout.write(f'{deleted} expired credentials deleted.')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+SEARCH_FIELDS = ('username', 'full_name', 'email')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # served by UserSearchService on PostgreSQL, other databases use the in-process PrefixIndex
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        # same expression as the istartswith / icontains lookups: UPPER("field"::text)
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS user_{field}_trgm_idx ON user_user USING gin (UPPER({field}::text) gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
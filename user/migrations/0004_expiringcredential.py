@@ -0,0 +1,71 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:58
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# rows of the old tables stayed valid for 5 minutes after their last update
+OLD_TTL = datetime.timedelta(minutes=5)
+
+
+def copy_credentials(apps, schema_editor):
+    ExpiringCredential = apps.get_model('user', 'ExpiringCredential')
+    ForgotPasswordOTP = apps.get_model('user', 'ForgotPasswordOTP')
+    MailVerificationToken = apps.get_model('user', 'MailVerificationToken')
+    live = timezone.now() - OLD_TTL
+
+    credentials = [
+        ExpiringCredential(user_id=row.user_id, purpose='password_reset_otp', secret=str(row.otp),
+                           created_at=row.updated_at, expires_at=row.updated_at + OLD_TTL)
+        for row in ForgotPasswordOTP.objects.filter(updated_at__gt=live)
+    ]
+    credentials += [
+        ExpiringCredential(user_id=row.user_id, purpose='mail_verification', secret=row.token,
+                           created_at=row.updated_at, expires_at=row.updated_at + OLD_TTL)
+        for row in MailVerificationToken.objects.filter(updated_at__gt=live)
+    ]
+    ExpiringCredential.objects.bulk_create(credentials, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_outgoingmail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiringCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(choices=[('password_reset_otp', 'Password Reset OTP'), ('mail_verification', 'Mail Verification')], max_length=20)),
+                ('secret', models.CharField(max_length=128)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='credentials', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_credentials, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='mailverificationtoken',
+            name='user',
+        ),
+        migrations.DeleteModel(
+            name='ForgotPasswordOTP',
+        ),
+        migrations.DeleteModel(
+            name='MailVerificationToken',
+        ),
+        migrations.AddIndex(
+            model_name='expiringcredential',
+            index=models.Index(fields=['purpose', 'secret'], name='user_expiri_purpose_865d82_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expiringcredential',
+            unique_together={('user', 'purpose')},
+        ),
+    ]
@@ -1,4 +1,3 @@
-import datetime
 from django.forms import ValidationError
 from django.utils import timezone
 from django.db import models
@@ -37,79 +36,84 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
-class ForgotPasswordOTP(models.Model):
+class ExpiringCredential(models.Model):
     """
-    Model for storing OTPs for password reset functionality.
-    - user_id: OneToOneField to the User model, ensures each user has a unique OTP.
-    - otp: PositiveInteger field for the OTP value.
-    - updated_at: DateTime field for the timestamp when the OTP was last updated.
+    Short-lived secrets sent to a user: password reset OTPs and email verification tokens.
+    - user: ForeignKey to the User model, one credential per user and purpose.
+    - purpose: What the secret is for.
+    - secret: The OTP or token, maximum length of 128 characters.
+    - expires_at: DateTime field after which the secret is no longer accepted.
+    - created_at: DateTime field for the timestamp when the secret was issued.
+
+    Expired rows are ignored by the lookups and deleted in chunks by
+    `python manage.py sweep_expired_credentials`.
 
     Methods:
-    - isExpired: Checks if the OTP has expired (older than 5 minutes) and deletes it if expired.
-    - __str__: Returns a string representation indicating the user the OTP is for.
+    - is_expired: Whether the credential is past its expiry.
+    - __str__: Returns a string representation indicating the user and purpose of the credential.
     """
-    user = models.OneToOneField(User, on_delete=models.CASCADE, editable=False, unique=True)
-    otp = models.PositiveIntegerField(null=False, blank=False)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    def isExpired(self):
-        """
-        Checks if the OTP has expired (older than 5 minutes) and deletes it if expired.
-        Returns True if expired, False otherwise.
-        """
-
-        # Get the current time with timezone information
-        five_minute_ago = timezone.now() - datetime.timedelta(minutes=5)
-        
-        # Ensure `self.updated_at` is also timezone-aware
-        if timezone.is_naive(self.updated_at):
-            self.updated_at = timezone.make_aware(self.updated_at, timezone.get_current_timezone())
-        
-    
-        if self.updated_at < five_minute_ago:
-            self.delete()
-            return True
-
-        return False
-    
+    PASSWORD_RESET_OTP = 'password_reset_otp'
+    MAIL_VERIFICATION = 'mail_verification'
+    PURPOSE_CHOICES = (
+        (PASSWORD_RESET_OTP, 'Password Reset OTP'),
+        (MAIL_VERIFICATION, 'Mail Verification'),
+    )
+
+    user = models.ForeignKey(User, editable=False, related_name='credentials', on_delete=models.CASCADE)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    secret = models.CharField(max_length=128)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
     def __str__(self):
-        return f"FORGOT PASSWORD OTP for {self.user.username}"
-    
-class MailVerificationToken(models.Model):
-    """
-    Model for storing email verification tokens.
-    - user_id: OneToOneField to the User model, ensures each user has a unique verification token.
-    - token: CharField for the token value, maximum length of 128 characters.
-    - updated_at: DateTime field for the timestamp when the token was last updated.
+        return f"{self.get_purpose_display()} for {self.user_id}"
 
-    Methods:
-    - isExpired: Checks if the token has expired (older than 5 minutes) and deletes it if expired.
-    - __str__: Returns a string representation indicating the user the token is for.
+    class Meta:
+        unique_together = ('user', 'purpose')
+        indexes = [
+            # verification links are looked up by token alone
+            models.Index(fields=['purpose', 'secret']),
+        ]
+
+
+class OutgoingMail(models.Model):
     """
+    Persistent outbox of emails, sent in the background by
+    `MailOutboxService.send_pending` over one reused SMTP connection per batch.
+
+    - subject, body, from_email: The message.
+    - recipients: JSON list of email addresses.
+    - status: pending until sent, failed once MAIL_OUTBOX_MAX_ATTEMPTS attempts failed.
+    - attempts: Number of failed attempts so far.
+    - next_attempt_at: When the mail is due; pushed back exponentially after each failure.
+    - last_error: Error of the last failed attempt.
+    - created_at / sent_at: Timestamps.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
 
-    user = models.OneToOneField(User, editable=False, related_name= 'verification_token', on_delete=models.CASCADE, unique=True)
-    token = models.CharField(128)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    def isExpired(self):
-        """
-        Checks if the OTP has expired (older than 5 minutes) and deletes it if expired.
-        Returns True if expired, False otherwise.
-        """
-
-        # Get the current time with timezone information
-        five_minute_ago = timezone.now() - datetime.timedelta(minutes=5)
-        
-        # Ensure `self.updated_at` is also timezone-aware
-        if timezone.is_naive(self.updated_at):
-            self.updated_at = timezone.make_aware(self.updated_at, timezone.get_current_timezone())
-        
-    
-        if self.updated_at < five_minute_ago:
-            self.delete()
-            return True
-
-        return False
-    
     def __str__(self):
-        return f"Verification token for {self.user.username}"
\ No newline at end of file
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # due mails, oldest first
+            models.Index(fields=['next_attempt_at', 'id'], condition=Q(status='pending'), name='outgoing_mail_due_idx'),
+        ]
@@ -0,0 +1,140 @@
+import threading
+from bisect import bisect_left, insort
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Lower
+from group.models import Membership
+from .models import User
+
+# match ranks, best first
+EXACT, USERNAME_PREFIX, NAME_PREFIX, EMAIL_PREFIX = range(4)
+
+
+def search_keys(username, full_name, email):
+    """
+    Lowercased search keys of a user with their rank: the username, every word
+    of the full name and the email (whose prefixes are the prefixes of its local part).
+    """
+    keys = [(username.lower(), USERNAME_PREFIX)]
+    keys += [(word, NAME_PREFIX) for word in (full_name or '').lower().split()]
+    keys.append((email.lower(), EMAIL_PREFIX))
+    return keys
+
+
+class PrefixIndex:
+    """
+    In-process sorted-prefix index of the users, used where the database has no
+    trigram index (SQLite, test runs).
+
+    Keys are kept in one sorted list of (key, rank, user id), so the users
+    matching a prefix are a contiguous range found with a binary search. The
+    index is built on first use and kept current by the User signal receivers.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = None
+        self.keys = {}
+
+    def build(self):
+        entries = []
+        keys = {}
+        for id, username, full_name, email in User.objects.filter(is_deleted=False).values_list('id', 'username', 'full_name', 'email').iterator(chunk_size=2000):
+            keys[id] = [(key, rank, id) for key, rank in search_keys(username, full_name, email)]
+            entries += keys[id]
+        entries.sort()
+        self.entries, self.keys = entries, keys
+
+    def update(self, user):
+        with self.lock:
+            if self.entries is None:
+                return
+            self.remove_entries(user.id)
+            if not user.is_deleted:
+                self.keys[user.id] = [(key, rank, user.id) for key, rank in search_keys(user.username, user.full_name, user.email)]
+                for entry in self.keys[user.id]:
+                    insort(self.entries, entry)
+
+    def remove(self, user_id):
+        with self.lock:
+            if self.entries is not None:
+                self.remove_entries(user_id)
+
+    def remove_entries(self, user_id):
+        for entry in self.keys.pop(user_id, []):
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def search(self, prefix):
+        """
+        Returns:
+        dict: user id -> best rank, for every user with a key starting with prefix.
+        """
+        with self.lock:
+            if self.entries is None:
+                self.build()
+            matches = {}
+            position = bisect_left(self.entries, (prefix,))
+            while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+                key, rank, user_id = self.entries[position]
+                rank = EXACT if rank == USERNAME_PREFIX and key == prefix else rank
+                matches[user_id] = min(rank, matches.get(user_id, rank))
+                position += 1
+            return matches
+
+
+prefix_index = PrefixIndex()
+
+
+class UserSearchService:
+    @staticmethod
+    def search(user, query):
+        """
+        Ranked prefix search of users on username, full name words and email local part.
+
+        Exact usernames come first, then username, full name and email prefixes.
+        Users sharing a group with the caller are boosted above everyone else.
+        On PostgreSQL the matching is served by the trigram indexes of migration
+        user 0002 and ties are ordered by trigram similarity; other databases use
+        the in-process PrefixIndex.
+
+        Args:
+        user (User): The user searching, left out of the results.
+        query (str): The prefix typed.
+
+        Returns:
+        QuerySet | list: The matching users, best first.
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return User.objects.none()
+
+        co_members = Membership.objects.filter(group__members=user).values('user_id')
+
+        if connection.vendor == 'postgresql':
+            return UserSearchService.search_database(user, query, co_members)
+
+        ranks = prefix_index.search(query)
+        boosted = set(co_members.filter(user_id__in=ranks.keys()).values_list('user_id', flat=True))
+        users = User.objects.filter(id__in=ranks.keys(), is_deleted=False).exclude(id=user.id)
+        return sorted(users, key=lambda match: (match.id not in boosted, ranks[match.id], match.username.lower()))
+
+    @staticmethod
+    def search_database(user, query, co_members):
+        username = Lower('username')
+        return User.objects.filter(
+            Q(username__istartswith=query) | Q(full_name__istartswith=query) |
+            Q(full_name__icontains=' ' + query) | Q(email__istartswith=query),
+            is_deleted=False,
+            ).exclude(id=user.id).annotate(
+            rank=Case(
+                When(username__iexact=query, then=Value(EXACT)),
+                When(username__istartswith=query, then=Value(USERNAME_PREFIX)),
+                When(Q(full_name__istartswith=query) | Q(full_name__icontains=' ' + query), then=Value(NAME_PREFIX)),
+                default=Value(EMAIL_PREFIX),
+                output_field=IntegerField(),
+                ),
+            co_member=Exists(co_members.filter(user_id=OuterRef('pk'))),
+            similarity=TrigramSimilarity(username, query),
+            ).order_by('-co_member', 'rank', '-similarity', username)
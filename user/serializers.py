@@ -22,6 +22,24 @@ class UserMiniProfileSerializer(serializers.ModelSerializer) :
         ]
         read_only_fields = ['id', 'username']
 
+# Fast, dict-producing twins of the serializers used on hot read paths.
+# They are built from `.values()` rows (optionally prefixed, e.g. 'triggered_by__')
+# and must render byte-identical JSON to their ModelSerializer counterparts.
+USER_MINI_PROFILE_FIELDS = ('id', 'username', 'full_name', 'avatar')
+
+def user_mini_profile_values(prefix = ''):
+    return [prefix + field for field in USER_MINI_PROFILE_FIELDS]
+
+def fast_user_mini_profile(row, prefix = ''):
+    if row[prefix + 'id'] is None:
+        return None
+    return {
+        'id': str(row[prefix + 'id']),
+        'username': row[prefix + 'username'],
+        'full_name': row[prefix + 'full_name'],
+        'avatar': row[prefix + 'avatar'],
+    }
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -40,14 +58,3 @@ class UserProfileSerializer(UserMiniProfileSerializer):
         model = User
         fields = UserMiniProfileSerializer.Meta.fields + ['email']
 
-
-class ForgotPasswordSerializer(serializers.ModelSerializer):
-    
-    class Meta:
-        model = ForgotPasswordOTP
-        fields = '__all__'
-        read_only_fields = ['id', 'user', 'updated_at']
-
-    def create(self, validated_data):
-        validated_data['user'] = self.context['user']
-        return super().create(validated_data)
@@ -0,0 +1,277 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .models import ExpiringCredential, OutgoingMail, User
+
+
+class LoginError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class LoginService:
+    @staticmethod
+    def run_hasher(function, *args):
+        """
+        Run a password hashing function under the hashing concurrency limit.
+
+        The hash runs on the calling request thread. At most PASSWORD_HASH_WORKERS
+        hashes run at once and PASSWORD_HASH_QUEUE more requests may wait for
+        their turn; past that the login is refused right away instead of piling
+        up request workers behind the CPU-bound hashing.
+
+        Raises:
+        LoginError: (503) when the limit and its queue are full.
+        """
+        global _hash_workers, _hash_slots
+        if _hash_workers is None:
+            with _hash_lock:
+                if _hash_workers is None:
+                    _hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+                    _hash_workers = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS)
+
+        if not _hash_slots.acquire(blocking=False):
+            raise LoginError('Too many login attempts, please retry.', 503)
+        try:
+            with _hash_workers:
+                return function(*args)
+        finally:
+            _hash_slots.release()
+
+    @staticmethod
+    def check_password(user, password):
+        """
+        Verify a password under the hashing concurrency limit, rehashing it (the
+        only write of a login) when the stored hash uses outdated parameters.
+
+        Args:
+        user (User): The user loaded for the login.
+        password (str): The raw password.
+
+        Returns:
+        bool: Whether the password matches.
+        """
+        outdated = []
+        valid = LoginService.run_hasher(check_password, password, user.password, outdated.append)
+        if valid and outdated:
+            user.password = LoginService.run_hasher(make_password, password)
+            user.save(update_fields=['password'])
+        return valid
+
+    @staticmethod
+    def login(email, password, request=None):
+        """
+        Log a user in with one query on the happy path: the user and its token
+        are fetched together, nothing is written unless the token is missing or
+        the password hash has to be upgraded.
+
+        Args:
+        email (str): The email of the user.
+        password (str): The raw password.
+        request (Request): Passed to the user_login_failed signal.
+
+        Returns:
+        str: The authentication token key.
+
+        Raises:
+        LoginError: With the message and status code of the failure.
+        """
+        user = User.objects.select_related('auth_token').filter(email=email).first()
+        if user is None:
+            raise LoginError('New User', 400)
+
+        if not LoginService.check_password(user, password) or not user.is_active:
+            user_login_failed.send(sender=__name__, credentials={'username': email}, request=request)
+            raise LoginError('Invalid credentials', 401)
+
+        if not user.is_verified:
+            raise LoginError('Please verify your email first', 403)
+
+        try:
+            return user.auth_token.key
+        except Token.DoesNotExist:
+            token, created = Token.objects.get_or_create(user=user)
+            return token.key
+
+
+class MailOutboxService:
+    @staticmethod
+    def enqueue(subject, body, emails, from_email=None):
+        """
+        Queue an email in the outbox. It is sent after the current transaction
+        commits, by a background thread (MAIL_OUTBOX_INLINE_SEND) or by
+        `python manage.py send_mail_outbox`.
+
+        Returns:
+        OutgoingMail: The queued mail.
+        """
+        mail = OutgoingMail.objects.create(
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.EMAIL_HOST_USER,
+            recipients=list(emails),
+            )
+        if settings.MAIL_OUTBOX_INLINE_SEND:
+            transaction.on_commit(MailOutboxService.schedule_send)
+        return mail
+
+    @staticmethod
+    def schedule_send():
+        global _mail_executor
+        if _mail_executor is None:
+            _mail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mail-outbox')
+        _mail_executor.submit(MailOutboxService.send_pending_in_thread)
+
+    @staticmethod
+    def send_pending_in_thread():
+        try:
+            MailOutboxService.send_pending()
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def send_pending(batch_size=100):
+        """
+        Send the due mails of the outbox.
+
+        Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+        senders can run at once, and sent over a single connection from
+        `get_connection()` (any EMAIL_BACKEND: smtp, console, locmem...). A mail
+        that fails is retried after MAIL_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+        seconds, and marked failed after MAIL_OUTBOX_MAX_ATTEMPTS attempts.
+
+        Args:
+        batch_size (int): Mails sent per connection and transaction.
+
+        Returns:
+        int: Number of mails sent.
+        """
+        sent = 0
+        while True:
+            with transaction.atomic():
+                mails = list(OutgoingMail.objects.select_for_update(skip_locked=True).filter(
+                    status='pending', next_attempt_at__lte=timezone.now()).order_by('next_attempt_at', 'id')[:batch_size])
+                if not mails:
+                    return sent
+
+                try:
+                    connection = get_connection(fail_silently=False)
+                    connection.open()
+                except Exception as e:
+                    for mail in mails:
+                        MailOutboxService.mark_failed(mail, e)
+                    OutgoingMail.objects.bulk_update(mails, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+                    return sent
+
+                try:
+                    for mail in mails:
+                        try:
+                            EmailMessage(mail.subject, mail.body, mail.from_email, mail.recipients, connection=connection).send()
+                        except Exception as e:
+                            MailOutboxService.mark_failed(mail, e)
+                        else:
+                            mail.status = 'sent'
+                            mail.sent_at = timezone.now()
+                            sent += 1
+                finally:
+                    connection.close()
+
+                OutgoingMail.objects.bulk_update(mails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+
+    @staticmethod
+    def mark_failed(mail, error):
+        mail.attempts += 1
+        mail.last_error = str(error)
+        if mail.attempts >= settings.MAIL_OUTBOX_MAX_ATTEMPTS:
+            mail.status = 'failed'
+        else:
+            backoff = settings.MAIL_OUTBOX_RETRY_BACKOFF * 2 ** (mail.attempts - 1)
+            mail.next_attempt_at = timezone.now() + datetime.timedelta(seconds=backoff)
+
+
+class CredentialService:
+    @staticmethod
+    def issue(user, purpose, secret):
+        """
+        Store a new secret for the user and purpose in one upsert, replacing the
+        previous one. It expires after the purpose's TTL (CREDENTIAL_TTLS).
+
+        Args:
+        user (User): The user the secret is sent to.
+        purpose (str): One of ExpiringCredential.PURPOSE_CHOICES.
+        secret (str | int): The OTP or token.
+
+        Returns:
+        ExpiringCredential: The credential stored.
+        """
+        now = timezone.now()
+        credential = ExpiringCredential(
+            user=user,
+            purpose=purpose,
+            secret=str(secret),
+            created_at=now,
+            expires_at=now + datetime.timedelta(seconds=settings.CREDENTIAL_TTLS[purpose]),
+            )
+        ExpiringCredential.objects.bulk_create(
+            [credential],
+            update_conflicts=True,
+            unique_fields=['user', 'purpose'],
+            update_fields=['secret', 'created_at', 'expires_at'],
+            )
+        return credential
+
+    @staticmethod
+    def lookup(purpose, **filters):
+        """
+        Fetch a credential together with its user in one query.
+
+        Args:
+        purpose (str): One of ExpiringCredential.PURPOSE_CHOICES.
+        **filters: Lookups identifying it, e.g. secret=... or user__email=...
+
+        Returns:
+        ExpiringCredential | None: The credential, expired or not.
+        """
+        return ExpiringCredential.objects.select_related('user').filter(purpose=purpose, **filters).first()
+
+    @staticmethod
+    def consume(credential):
+        """
+        Delete a credential once used, in one query.
+
+        Returns:
+        bool: False when it was already consumed (by a concurrent request).
+        """
+        deleted, _ = ExpiringCredential.objects.filter(pk=credential.pk).delete()
+        return bool(deleted)
+
+    @staticmethod
+    def sweep(batch_size=1000):
+        """
+        Delete the expired credentials, batch_size rows per query, using the
+        expires_at index.
+
+        Returns:
+        int: Number of credentials deleted.
+        """
+        deleted = 0
+        now = timezone.now()
+        while True:
+            ids = list(ExpiringCredential.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += ExpiringCredential.objects.filter(id__in=ids).delete()[0]
+
+
+_mail_executor = None
+_hash_lock = threading.Lock()
+_hash_workers = None
+_hash_slots = None
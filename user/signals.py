@@ -25,3 +25,42 @@
 
 
         
+
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import User
+from rest_framework.authtoken.models import Token
+from utils.authentication import token_cache
+from .search import prefix_index
+
+
+@receiver(post_save, sender = User)
+def update_search_index(sender, instance, **kwargs):
+    """
+    Signal receiver to keep the in-process user search index current.
+    """
+    prefix_index.update(instance)
+
+
+@receiver(post_save, sender = User)
+def refresh_token_cache(sender, instance, created, **kwargs):
+    """
+    Signal receiver to drop the cached copies of a saved user (password,
+    is_active, profile...) so their next request loads it again.
+    """
+    if not created:
+        token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender = User)
+def remove_from_search_index(sender, instance, **kwargs):
+    prefix_index.remove(instance.id)
+
+
+@receiver(post_delete, sender = Token)
+def remove_from_token_cache(sender, instance, **kwargs):
+    """
+    Signal receiver to stop accepting a deleted token from the authentication cache.
+    """
+    token_cache.invalidate(instance.key)
@@ -1,3 +1,170 @@
-from django.test import TestCase
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.models import ExpiringCredential, User
+from user.service import CredentialService
+from utils.authentication import TokenCache, token_cache
 
-# Create your tests here.
+
+class TokenCacheTests(SimpleTestCase):
+    """
+    The LRU / TTL bookkeeping of TokenCache.
+    """
+    def user(self, pk):
+        user = User(username=f'user-{pk}', email=f'user-{pk}@example.com')
+        user.pk = pk
+        return user
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', self.user(1), 'token-a')
+        cache.set('b', self.user(2), 'token-b')
+        cache.get('a')
+        cache.set('c', self.user(3), 'token-c')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a')[1], 'token-a')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        cache = TokenCache(maxsize=2, ttl=0)
+        cache.set('a', self.user(1), 'token-a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_invalidate_user_drops_all_their_tokens(self):
+        cache = TokenCache(maxsize=10, ttl=60)
+        cache.set('a', self.user(1), 'token-a')
+        cache.set('b', self.user(1), 'token-b')
+        cache.set('c', self.user(2), 'token-c')
+        cache.invalidate_user(1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Cached tokens stop being accepted as soon as the user is saved or logs out.
+    """
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create(username='user', email='user@example.com', full_name='Old Name')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def get_profile(self):
+        return self.client.get(reverse('current_user_detail'))
+
+    def assertRejected(self):
+        # 403 rather than 401: SessionAuthentication comes first and sends no challenge
+        self.assertEqual(self.get_profile().status_code, 403)
+
+    def test_token_is_cached(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    def test_saving_the_user_evicts_it(self):
+        self.get_profile()
+        self.user.full_name = 'New Name'
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.get_profile().data['data']['full_name'], 'New Name')
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_profile()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected()
+
+    def test_logout_evicts_the_token(self):
+        self.get_profile()
+        response = self.client.get(reverse('logout'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertRejected()
+
+
+@override_settings(ACTIVITY_OUTBOX_INLINE_DRAIN=False, MAIL_OUTBOX_INLINE_SEND=False)
+class ExpiringCredentialTests(TestCase):
+    """
+    Password reset OTPs and mail verification tokens: one live secret per user
+    and purpose, rejected once expired or used, swept in batches.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username='user', email='user@example.com')
+        self.client = APIClient()
+
+    def expire(self, credential):
+        ExpiringCredential.objects.filter(pk=credential.pk).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+    def request_token(self, otp):
+        return self.client.post(reverse('reset_password_token'), {'email': self.user.email, 'otp': otp}, format='json')
+
+    def test_issue_replaces_the_previous_secret(self):
+        CredentialService.issue(self.user, ExpiringCredential.PASSWORD_RESET_OTP, 1111)
+        CredentialService.issue(self.user, ExpiringCredential.PASSWORD_RESET_OTP, 2222)
+        CredentialService.issue(self.user, ExpiringCredential.MAIL_VERIFICATION, 'token')
+
+        self.assertEqual(self.user.credentials.count(), 2)
+        self.assertEqual(CredentialService.lookup(ExpiringCredential.PASSWORD_RESET_OTP, user=self.user).secret, '2222')
+
+    def test_otp_is_used_once(self):
+        response = self.client.put(reverse('reset_password_otp_mail'), {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200)
+        otp = CredentialService.lookup(ExpiringCredential.PASSWORD_RESET_OTP, user=self.user).secret
+
+        self.assertEqual(self.request_token('0').data['message'], 'incorrect otp')
+        response = self.request_token(otp)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Token.objects.filter(user=self.user, key=response.data['token']).exists())
+        self.assertEqual(self.request_token(otp).data['message'], 'try resending otp')
+
+    def test_expired_otp_is_rejected(self):
+        credential = CredentialService.issue(self.user, ExpiringCredential.PASSWORD_RESET_OTP, 1234)
+        self.expire(credential)
+        response = self.request_token(1234)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'otp expired')
+
+    def test_mail_verification(self):
+        credential = CredentialService.issue(self.user, ExpiringCredential.MAIL_VERIFICATION, 'expired-token')
+        self.expire(credential)
+        response = self.client.get(reverse('verify-mail'), {'token': 'expired-token'})
+        self.assertEqual(response.data['message'], 'Link Expired')
+
+        CredentialService.issue(self.user, ExpiringCredential.MAIL_VERIFICATION, 'live-token')
+        response = self.client.get(reverse('verify-mail'), {'token': 'live-token'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        self.assertFalse(self.user.credentials.exists())
+
+    def test_sweep_deletes_only_expired_credentials(self):
+        users = [User.objects.create(username=f'user-{i}', email=f'user-{i}@example.com') for i in range(5)]
+        credentials = [CredentialService.issue(user, ExpiringCredential.MAIL_VERIFICATION, f'token-{i}') for i, user in enumerate(users)]
+        for credential in credentials[:3]:
+            self.expire(credential)
+
+        self.assertEqual(CredentialService.sweep(batch_size=2), 3)
+        self.assertEqual(sorted(ExpiringCredential.objects.values_list('secret', flat=True)), ['token-3', 'token-4'])
+        self.assertEqual(CredentialService.sweep(), 0)
+
+    def test_sweep_command(self):
+        credential = CredentialService.issue(self.user, ExpiringCredential.MAIL_VERIFICATION, 'token')
+        self.expire(credential)
+        out = StringIO()
+        call_command('sweep_expired_credentials', stdout=out)
+        self.assertIn('1 expired credentials deleted.', out.getvalue())
+        self.assertFalse(ExpiringCredential.objects.exists())
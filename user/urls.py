@@ -15,4 +15,5 @@ urlpatterns = [
     path('', views.CurrentUserDetailView.as_view(), name = 'current_user_detail'),
     path('search/', views.SearchUsersView.as_view(), name = 'search_users'),
     path('edit/', views.UpdateUserProfileView.as_view(), name = 'edit_profile'),
+    path('auth/token-cache/', views.TokenCacheStatsView.as_view(), name = 'token_cache_stats'),
 ]
\ No newline at end of file
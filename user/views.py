@@ -1,13 +1,17 @@
+from django.db import transaction
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .serializers import *
-from .models import User
+from .models import ExpiringCredential, User
 from rest_framework.authtoken.models import Token
 from rest_framework import permissions
-from django.contrib.auth import authenticate
 from user.models import User
 from utils.utils import CommonUtils, Mail, UserUtils
+from group.service import GroupService
+from user.search import UserSearchService
+from user.service import CredentialService, LoginError, LoginService
+from utils.authentication import token_cache
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -95,6 +99,9 @@ class UpdateUserProfileView(generics.GenericAPIView) :
             serializer = UserMiniProfileSerializer(user, data = data, partial = True)  
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            # the group payloads embed the member profiles
+            GroupService.bump_member_group_versions(user)
+            token_cache.invalidate_user(user.id)
             
             try :   
                 if current_avatar:
@@ -133,29 +140,12 @@ class LoginView(generics.GenericAPIView) :
     
     def post(self, request, *args, **kwargs) :
         try :
-            username = request.data['email']
-            password = request.data['password']
-            if not User.objects.filter(email = username).exists() :
-               return Response({'status': False, 'message': 'New User'}, status=400)
-                
-            user = authenticate(password = password, username = username)
-            
-            if user:
-                user.save()
-                
-                if not user.is_verified:
-                    return Response({'status': False, 'message': 'Please verify your email first'}, status=403)
-                
-                if not user.is_active :
-                    user.is_active = True
-                    user.save()
-                
-                token, created = Token.objects.get_or_create(user=user)
-                return Response({'token': token.key}, status = 200)
-        
-            else:
-                return Response({'status': False, 'message': 'Invalid credentials'}, status=401)
-        
+            token = LoginService.login(email = request.data['email'], password = request.data['password'], request = request)
+            return Response({'token': token}, status = 200)
+
+        except LoginError as e:
+            return Response({'status': False, 'message': str(e)}, status=e.status)
+
         except Exception as e:
                 return Response({'status': False, 'message': str(e)}, status=400)
 
@@ -174,6 +164,7 @@ class LogoutView(generics.RetrieveAPIView) :
                 token = Token.objects.get(key = token)
                 
                 token.delete()
+                token_cache.invalidate(token.key)
                 return Response({'status': True, 'message': 'User Logout Successfully'}, status = 200)
             
             else :
@@ -190,19 +181,18 @@ class SearchUsersView(generics.ListAPIView) :
     
     def get_queryset(self):
         username = self.request.query_params.get('username', None)
-        queryset = User.objects.filter(username__icontains=username)
-        return queryset
+        return UserSearchService.search(user = self.request.user, query = username)
     
 
     @swagger_auto_schema(
         tags=['User'],
         operation_summary="SEARCH USER",
-        operation_description='Results in User\'s detailed list based on search with username or select all with pagination',
+        operation_description='Ranked prefix search on username, full name and email, users sharing a group with you first. Paginated.',
         manual_parameters=[
             openapi.Parameter(
                 name='username',  # name of the parameter
                 in_=openapi.IN_QUERY,  # location of the parameter
-                description='Username for search',  # description of the parameter
+                description='Prefix of a username, full name word or email',  # description of the parameter
                 type=openapi.TYPE_STRING,  # type of the parameter
                 required=True,  # make it required
             ),
@@ -233,9 +223,7 @@ class CurrentUserDetailView(generics.GenericAPIView):
 
 
 
-class SendPasswordResetOTPView(generics.UpdateAPIView):
-    serializer_class = ForgotPasswordSerializer
-    queryset = ForgotPasswordOTP.objects.all()
+class SendPasswordResetOTPView(APIView):
     http_method_names = ['put']
     
 
@@ -254,21 +242,12 @@ class SendPasswordResetOTPView(generics.UpdateAPIView):
             email = request.data['email']
             subject = 'Passwrod Reset Verfication Mail'
             body = CommonUtils.otp_generator()
-            mail = Mail(subject, f'OTP: {str(body)}', [email])
+            user = User.objects.filter(email = email).first()
             
-            if User.objects.filter(email = email).exists():
-                user = User.objects.get(email = email)
-                
-                if ForgotPasswordOTP.objects.filter(user = user.id).exists():
-                    serializer = ForgotPasswordOTP.objects.get(user = user.id)
-                    serializer.otp = body
-                    
-                else :
-                    data = {'otp' : body, 'user' : user.id}
-                    serializer = self.serializer_class(data = data, context = {'user' : user})
-                    serializer.is_valid(raise_exception=True)
-                mail.send()
-                serializer.save()
+            if user:
+                with transaction.atomic():
+                    CredentialService.issue(user, ExpiringCredential.PASSWORD_RESET_OTP, body)
+                    Mail(subject, f'OTP: {str(body)}', [email]).send()
                 return Response({'message' : 'OTP sent to your mail succesfully'}, status=200)
             
             else :
@@ -307,21 +286,22 @@ class ResetPasswordTokenGenerationView(APIView):
         try :
             otp = request.data['otp']
             email = request.data['email']
-            if User.objects.filter(email = email).exists():
-                user = User.objects.get(email = email)
-            else : raise Exception('email not found')
-            
-            if ForgotPasswordOTP.objects.filter(user_id = user.id).exists():
-                obj = ForgotPasswordOTP.objects.get(user_id = user.id)
-            else : raise Exception('try resending otp')
-            
+            obj = CredentialService.lookup(ExpiringCredential.PASSWORD_RESET_OTP, user__email = email)
+            if not obj:
+                if not User.objects.filter(email = email).exists():
+                    raise Exception('email not found')
+                raise Exception('try resending otp')
            
-            if obj.isExpired():
+            if obj.is_expired():
                 raise Exception('otp expired')
             
-            if obj.otp != int(otp):
+            if obj.secret != str(otp):
                 raise Exception('incorrect otp')
             
+            if not CredentialService.consume(obj):
+                raise Exception('try resending otp')
+
+            user = obj.user
             token, created = Token.objects.get_or_create(user=user)
             return Response({'token' : str(token)}, status = 200)
         
@@ -352,6 +332,7 @@ class ResetPasswordView(generics.GenericAPIView):
             serializer = UserRegistrationSerializer(user, data = data, partial = True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            token_cache.invalidate_user(user.id)
         
             return Response({'message' : 'password reset successfully'}, status = 200)
         except Exception as e:
@@ -379,17 +360,19 @@ class MailVerifyView(generics.GenericAPIView):
     def get(self, request, *args, **kwargs):
         try : 
             token = request.GET['token']
-            token = MailVerificationToken.objects.filter(token = token).first()
+            token = CredentialService.lookup(ExpiringCredential.MAIL_VERIFICATION, secret = token)
             if not token:
                 raise Exception("Invalid Link")
 
-            if token.isExpired():
+            if token.is_expired():
                 raise Exception("Link Expired")  
 
+            if not CredentialService.consume(token):
+                raise Exception("Invalid Link")
+
             user = token.user
             user.is_verified = True
-            user.save()
-            token.delete()
+            user.save(update_fields = ['is_verified'])
             return  Response({'message' : 'Verification Successful'}, status=200)
         
         except Exception as e:
@@ -397,3 +380,12 @@ class MailVerifyView(generics.GenericAPIView):
 
         
 
+
+class TokenCacheStatsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = None
+
+    @swagger_auto_schema(tags = ['Auth'], 
+    operation_summary= "TOKEN CACHE METRICS", operation_description = 'HIT / MISS COUNTERS OF THE AUTHENTICATION TOKEN CACHE OF THE PROCESS SERVING THE REQUEST (ADMINS ONLY)')
+    def get(self, request):
+        return Response(token_cache.stats(), status = 200)
@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token key -> (user, token) whose entries expire after a TTL.
+
+    The cache lives in the process: entries are dropped explicitly on logout,
+    password reset and profile edits in this process, and other processes see
+    those changes once their entries expire, so the TTL bounds how long a
+    revoked token can still be accepted elsewhere.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.user_keys = {}
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, token, expires_at = entry
+            if expires_at <= time.monotonic():
+                self.expirations += 1
+                self.misses += 1
+                self.discard(key)
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return user, token
+
+    def set(self, key, user, token):
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (user, token, time.monotonic() + self.ttl)
+            self.user_keys.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self.evictions += 1
+                self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keys = self.user_keys.get(entry[0].pk, set())
+            keys.discard(key)
+            if not keys:
+                self.user_keys.pop(entry[0].pk, None)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.discard(key)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in list(self.user_keys.get(user_id, ())):
+                self.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_keys.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                }
+
+
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in TokenAuthentication that skips the token / user query for keys seen
+    in the last TOKEN_CACHE_TTL seconds.
+
+    Every request gets its own copy of the cached user, so views mutating
+    request.user never share state across requests. Saving a user drops its
+    entries; counters changed with queryset updates (unseen_total_activities)
+    are not reflected in the copy and must be read from the database.
+    """
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, copy.copy(user), token)
+        return user, token
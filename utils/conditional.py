@@ -0,0 +1,71 @@
+from django.core.exceptions import ValidationError
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.response import Response
+
+
+def group_etag(version):
+    """
+    Weak ETag of a group version. Every write that changes a group payload,
+    member profile edits included (`GroupService.bump_member_group_versions`),
+    bumps the version; the tag is weak because equal versions only promise
+    equivalent payloads, not byte-identical ones.
+    """
+    return 'W/' + quote_etag(str(version))
+
+
+class GroupVersionETagMixin:
+    """
+    Conditional GET for views whose payload only depends on one of the user's
+    groups (looked up by the `id` URL kwarg).
+
+    The group version is read with a single indexed query before anything else:
+    a matching `If-None-Match` is answered with 304 without touching the
+    serializers, otherwise the response carries the version as its ETag. Reading
+    the version first means the ETag can only ever be older than the payload,
+    never newer, so a client never caches a stale body under a fresh tag.
+    Views validate their query parameters in `validate_request`, which runs
+    first: an invalid request is answered with 400 even when the tag matches.
+    """
+    group_lookup_url_kwarg = 'id'
+    group_id = None
+    group_version = None
+
+    def get_group_version(self):
+        """
+        Returns:
+        tuple: (id, version) of the requested group, or None when the user is not a member.
+        """
+        try:
+            return self.request.user.groups_membership.filter(
+                id=self.kwargs[self.group_lookup_url_kwarg]).values_list('id', 'version').first()
+        except (ValueError, ValidationError):
+            return None
+
+    def validate_request(self):
+        """
+        Validate the query parameters, raising ValidationError when invalid.
+        """
+
+    def get(self, request, *args, **kwargs):
+        self.validate_request()
+        row = self.get_group_version()
+        if row is None:
+            return super().get(request, *args, **kwargs)
+
+        self.group_id, self.group_version = row
+        etag = group_etag(self.group_version)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # If-None-Match uses the weak comparison: ignore the W/ prefixes
+            tags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            if '*' in tags or etag.removeprefix('W/') in tags:
+                response = Response(status=304)
+                response['ETag'] = etag
+                response['Cache-Control'] = 'private, no-cache'
+                return response
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,108 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ActivityFeedPagination(BasePagination):
+    """
+    Keyset pagination for the activity feed, newest first.
+
+    The feed is made of several streams of `.values()` rows (see
+    `ActivityService.get_activity_streams`), each ordered by (-triggered_at, -id). Every page reads at most `page_size + 1`
+    rows per stream after the cursor, with `(triggered_at, id) < cursor` served by
+    the activity indexes instead of OFFSET scans, and k-way merges them. No total
+    count is run.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            triggered_at, id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return parse_datetime(triggered_at), id
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, activity):
+        return urlsafe_b64encode(f"{activity['triggered_at'].isoformat()}|{activity['id']}".encode()).decode()
+
+    def paginate_streams(self, streams, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if position:
+            triggered_at, id = position
+            after = Q(triggered_at__lt=triggered_at) | Q(triggered_at=triggered_at, id__lt=id)
+            streams = [stream.filter(after) for stream in streams]
+
+        rows = [list(stream[:page_size + 1]) for stream in streams]
+        merged = heapq.merge(*rows, key=lambda activity: (activity['triggered_at'], activity['id']), reverse=True)
+
+        page = []
+        seen = set()
+        for activity in merged:
+            if activity['id'] in seen:
+                continue
+            seen.add(activity['id'])
+            page.append(activity)
+            if len(page) > page_size:
+                break
+
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_streams([queryset], request, view)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ExpenseCursorPagination(CursorPagination):
+    """
+    Keyset pagination for a group's expenses, newest first.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -6,9 +6,10 @@ from rest_framework.response import Response
 import os
 import cloudinary
 import cloudinary.api
-from user.models import MailVerificationToken, User
+from user.models import ExpiringCredential, User
 from  rest_framework import serializers
-from django.core.mail import send_mail
+from django.db import transaction
+from user.service import CredentialService, MailOutboxService
 from config.settings import base
 import re
 
@@ -43,12 +44,14 @@ class UserUtils :
     
     @staticmethod
     def sendMailVerificationLink(email):
+        """
+        Store a new verification token for the user and queue the mail with the link.
+        Errors are raised: delivery failures are retried by the mail outbox.
+        """
         token = secrets.token_urlsafe(32)
         user = User.objects.get(email = email)
         base_endpoint = os.getenv('BASE_ENDPOINT')
-        print(os.getenv('BASE_ENDPOINT'))
         verification_link = base_endpoint+'user/verify/mail/'+f'?token={token}'
-        print("link ======>", verification_link)
         body = f"""
 Dear {user.username},
 
@@ -61,19 +64,8 @@ If you did not create an account with us, please ignore this email.
 Thank you,
 Split-Between Team
         """         
-        try :
-            print("link ===>", verification_link)
-            obj = MailVerificationToken.objects.filter(user = user).first()
-            
-            print("obj ===>", obj)
-            if obj:
-                obj.token = token  
-                
-            else:    
-                obj = MailVerificationToken(user = user, token=token)
-            
-            obj.save()
-            print("send =======")
+        with transaction.atomic():
+            CredentialService.issue(user, ExpiringCredential.MAIL_VERIFICATION, token)
 
             message = Mail(
                 subject = 'Please Verify Your Email Address',
@@ -81,10 +73,6 @@ Split-Between Team
                 emails = [email]
                 )
             message.send()
-            
-        except Exception as e:
-            print("error ===> ", str(e))
-            pass
 
 
 
@@ -125,11 +113,11 @@ class Mail:
     
     
     def send(self):
-        
-        send_mail(
-            self.subject, 
-            self.body,
-            base.EMAIL_HOST_USER,
-            self.emails,
-            fail_silently=False)
+        # queued in the mail outbox, sent in the background with retries
+        return MailOutboxService.enqueue(
+            subject = self.subject, 
+            body = self.body,
+            emails = self.emails,
+            from_email = base.EMAIL_HOST_USER,
+            )
         